@@ -74,6 +74,24 @@ async def get_current_user(token_payload: dict = Depends(verify_token)) -> str:
     return user_id
 
 
+async def get_admin_user(user_id: str = Depends(get_current_user)) -> str:
+    """
+    Require an admin (user ID listed in ADMIN_USER_IDS)
+    
+    Returns:
+        str: Admin user ID (UUID)
+    """
+    admin_ids = {uid.strip() for uid in settings.ADMIN_USER_IDS.split(",") if uid.strip()}
+    
+    if user_id not in admin_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    
+    return user_id
+
+
 async def get_current_user_optional(
     credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer(auto_error=False))
 ) -> str | None:
@@ -33,8 +33,54 @@ class Settings(BaseSettings):
     INSTAGRAM_USERNAME: str
     INSTAGRAM_PASSWORD: str
 
+    # ADMIN
+    ADMIN_USER_IDS: str = ""  # comma-separated Supabase user IDs
+
+    # GENERATION WORKERS
+    WORKER_LEASE_SECONDS: int = 120
+    WORKER_POLL_INTERVAL_SECONDS: float = 2.0
+    GENERATION_JOB_MAX_ATTEMPTS: int = 3
+
+    # GENERATION ADMISSION CONTROL (0 disables a limit)
+    GENERATION_MAX_IN_FLIGHT: int = 4  # synchronous generations across API processes (per process off Postgres)
+    GENERATION_MAX_QUEUED: int = 100  # jobs waiting in the generation queue
+    GENERATION_DEFAULT_SEGMENT_SECONDS: float = 90  # until enough latency samples exist
+
+    # VEO
+    VEO_MODELS: str = "veo-3.0-fast-generate-001"  # ordered fallback list, comma-separated
+    VEO_POLL_INTERVAL_SECONDS: float = 10
+    VEO_SEGMENT_DEADLINE_SECONDS: float = 600
+    VEO_HEDGE_ENABLED: bool = False  # doubles Veo spend for hedged segments
+    VEO_HEDGE_PERCENTILE: float = 95
+    VEO_HEDGE_DEFAULT_DELAY_SECONDS: float = 120  # until enough latency samples exist
+    VEO_BREAKER_FAILURE_RATE: float = 0.5
+    VEO_BREAKER_SLOW_CALL_SECONDS: float = 300
+    VEO_BREAKER_WINDOW: int = 20
+    VEO_BREAKER_MIN_CALLS: int = 5
+    VEO_BREAKER_COOLDOWN_SECONDS: float = 60
+
+    # SEGMENT POST-PROCESSING
+    SEGMENT_NORMALIZE_ENABLED: bool = True
+    SEGMENT_POSTPROCESS_WORKERS: int = 2
+
+    # VIDEO METADATA CACHE
+    VIDEO_CACHE_ENABLED: bool = True
+    VIDEO_CACHE_TTL_SECONDS: float = 60
+    VIDEO_CACHE_MAX_ENTRIES: int = 10000
+    VIDEO_CACHE_MAX_LISTING_ROWS: int = 500
+    VIDEO_CACHE_REDIS_URL: str | None = None  # shared backend (needs the redis package)
+
+    # LOCAL VIDEO DISK CACHE
+    VIDEO_DISK_CACHE_DIR: str | None = None  # defaults to <tmp>/adbrain_video_cache
+    VIDEO_DISK_CACHE_MAX_BYTES: int = 2 * 1024 ** 3  # 0 disables the cache
+
+    # ZIP EXPORT
+    EXPORT_PREFETCH_CONCURRENCY: int = 4  # videos read ahead from S3 at once
+    EXPORT_PREFETCH_BUFFER_BYTES: int = 8 * 1024 ** 2  # read-ahead per video
+    EXPORT_MAX_VIDEOS: int = 1000
+
     class Config:
         env_file = Path(__file__).parent / ".env"  # Changed from parent.parent to parent
         env_file_encoding = 'utf-8'
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,66 @@
+"""
+Idempotent schema upgrades for databases created by an older version of the models.
+
+create_all only adds missing tables; changes to existing tables are applied here.
+Runs on API and worker startup, or by hand with: python -m backend.db.migrations
+On Postgres the whole upgrade holds a transaction-scoped advisory lock, so replicas and
+workers starting together run it one at a time and later ones find nothing to do.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+from backend.db.models import Base, Video, engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary app-wide key for pg_advisory_xact_lock
+UPGRADE_LOCK_ID = 7_315_204_611
+
+
+def _drop_video_s3_key_unique(conn) -> None:
+    """video.s3_key used to be unique; content-addressed rows now share keys (see VideoObject)"""
+    inspector = inspect(conn)
+    for constraint in inspector.get_unique_constraints("video"):
+        if constraint["column_names"] != ["s3_key"]:
+            continue
+        if conn.dialect.name == "sqlite" or not constraint.get("name"):
+            # SQLite cannot drop a table constraint without rebuilding the table
+            logger.warning("video.s3_key is still UNIQUE; rebuild the video table to allow deduplicated uploads")
+            continue
+        logger.info(f"Dropping unique constraint {constraint['name']} on video.s3_key")
+        conn.execute(text(f'ALTER TABLE video DROP CONSTRAINT IF EXISTS "{constraint["name"]}"'))
+    for index in inspector.get_indexes("video"):
+        if index["column_names"] == ["s3_key"] and index.get("unique") and not index.get("duplicates_constraint"):
+            logger.info(f"Dropping unique index {index['name']} on video.s3_key")
+            conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+
+
+def _add_missing_columns(conn, table_name: str) -> None:
+    """Adds nullable columns introduced after the table was created"""
+    table = Base.metadata.tables[table_name]
+    existing = {column["name"] for column in inspect(conn).get_columns(table_name)}
+    for column in table.columns:
+        if column.name not in existing and column.nullable:
+            logger.info(f"Adding column {table_name}.{column.name}")
+            if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+            conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {if_not_exists}{column.name} {column.type.compile(dialect=conn.dialect)}'))
+
+
+def upgrade_schema(bind: Engine = engine) -> None:
+    with bind.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Released at commit; inspections below run after any concurrent upgrade finished
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": UPGRADE_LOCK_ID})
+        Base.metadata.create_all(bind=conn)
+        _drop_video_s3_key_unique(conn)
+        _add_missing_columns(conn, "generation_job")
+        # Non-unique lookup index for delete_video's reference checks
+        for index in Video.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade_schema()
+    print("Schema is up to date")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, LargeBinary, JSON
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
@@ -37,7 +37,8 @@ class Video(Base):
     id: int = Column(Integer, primary_key=True)
     owner_id: str = Column(String(36), nullable=False)  # Store UUID as string (Supabase user ID)
     bucket: str = Column(String(500), nullable=False)
-    s3_key: str = Column(String(500), nullable=False, unique=True)
+    # Content-addressed: rows holding identical bytes share one key (see VideoObject)
+    s3_key: str = Column(String(500), nullable=False, index=True)
     title: Optional[str] = Column(String(100))
     status = Column(SQLEnum(VideoStatus, name="video_status"), nullable=False)
     created_at: datetime = Column(DateTime, default=datetime.utcnow)
@@ -45,6 +46,54 @@ class Video(Base):
 
     # Note: No foreign key relationship to users table since Supabase manages users externally
 
+class VideoObject(Base):
+    """
+    One stored S3 object, keyed by content hash. ref_count is the number of Video rows
+    pointing at s3_key; the object is deleted from S3 when it drops to zero.
+    """
+    __tablename__ = "video_object"
+
+    s3_key: str = Column(String(500), primary_key=True)
+    sha256: str = Column(String(64), nullable=False, unique=True)
+    size: int = Column(BigInteger, nullable=False)
+    ref_count: int = Column(Integer, nullable=False, default=0)
+    created_at: datetime = Column(DateTime, default=datetime.utcnow)
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class GenerationJob(Base):
+    """
+    Queued /videos/generate request. Workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED
+    and hold them through a lease (lease_owner / lease_expires_at) renewed by heartbeats.
+    A RUNNING row whose lease expired is claimable again.
+    """
+    __tablename__ = "generation_job"
+
+    id: int = Column(Integer, primary_key=True)
+    owner_id: str = Column(String(36), nullable=False, index=True)
+    status = Column(SQLEnum(JobStatus, name="generation_job_status"), nullable=False, default=JobStatus.QUEUED, index=True)
+    prompt: str = Column(Text, nullable=False)
+    duration: int = Column(Integer, nullable=False)
+    title: Optional[str] = Column(String(100))
+    variants: int = Column(Integer, nullable=False, default=1)
+    # Reference image travels with the job so any node can run it
+    image_bytes: Optional[bytes] = Column(LargeBinary)
+    image_ext: Optional[str] = Column(String(10))
+    attempts: int = Column(Integer, nullable=False, default=0)
+    lease_owner: Optional[str] = Column(String(255))
+    lease_expires_at: Optional[datetime] = Column(DateTime, index=True)
+    result_video_ids = Column(JSON)
+    error: Optional[str] = Column(Text)
+    # Run time of the last attempt (claim to completion), used for queue ETAs
+    started_at: Optional[datetime] = Column(DateTime)
+    finished_at: Optional[datetime] = Column(DateTime)
+    created_at: datetime = Column(DateTime, default=datetime.utcnow)
+    updated_at: datetime = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 def get_db():
     db = SessionLocal()
     try:
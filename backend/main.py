@@ -1,6 +1,10 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.routes.video import router as video_router
+from backend.routes.admin import router as admin_router
+from backend.profiling import ProfilingMiddleware
+from backend.db.migrations import upgrade_schema
 
 from backend.config import settings
 
@@ -9,7 +13,13 @@ COMPANY_NAME = "AIBrain"
 # ------------------------------------------------------
 # App Initialization
 # ------------------------------------------------------
-app = FastAPI(title=f"{COMPANY_NAME} API", version="0.1.0", description="Backend for AI Ad Generator dashboard")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring an existing database up to the current models before serving
+    upgrade_schema()
+    yield
+
+app = FastAPI(title=f"{COMPANY_NAME} API", version="0.1.0", description="Backend for AI Ad Generator dashboard", lifespan=lifespan)
 
 # ------------------------------------------------------
 # Middleware
@@ -21,11 +31,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
 
 # ------------------------------------------------------
 # Routers
 # ------------------------------------------------------
 app.include_router(video_router, prefix="/v1", tags=["videos"])
+app.include_router(admin_router, prefix="/v1", tags=["admin"])
 
 # ------------------------------------------------------
 # Root route
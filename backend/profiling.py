@@ -0,0 +1,284 @@
+"""
+On-demand sampling profiler for live API processes.
+
+An admin starts a session for one route (or all routes) that lasts for the next N matching
+requests or for T seconds. While a matching request is in flight, a sampler thread snapshots
+every thread's Python stack each interval and counts them in collapsed-stack form
+(flamegraph.pl / speedscope ready). Wall time spent in ffmpeg subprocesses and boto3 calls is
+recorded through track_external() and the boto3 event hooks, and is emitted as synthetic
+"[external]" frames weighted in sample units.
+
+Sampling is process-wide: concurrent unprofiled requests running on other threads show up too.
+Idle threads (blocked in selectors/threading/queue waits) are skipped.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from starlette.routing import Match
+from typing import Dict, List, Optional
+import itertools
+import os
+import sys
+import threading
+import time
+
+MAX_STACK_DEPTH = 128
+MAX_SESSIONS_KEPT = 20
+IDLE_LEAF_FILES = ("threading.py", "selectors.py", "queue.py", "socket.py", "ssl.py")
+
+
+class ProfileSession:
+    def __init__(self, session_id: int, route: Optional[str], focus: Optional[str], max_requests: Optional[int], seconds: Optional[float], interval_ms: int):
+        self.id = session_id
+        self.route = route
+        self.focus = focus
+        self.max_requests = max_requests
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self.ends_at = time.monotonic() + seconds if seconds else None
+        self.requests_started = 0
+        self.requests_finished = 0
+        self.in_flight = 0
+        self.stopped = False
+        self.samples: Counter = Counter()
+        self.external_seconds: Counter = Counter()
+        self.external_calls: Counter = Counter()
+
+    @property
+    def accepting(self) -> bool:
+        """Whether new matching requests are still profiled"""
+        if self.stopped:
+            return False
+        if self.ends_at is not None and time.monotonic() >= self.ends_at:
+            return False
+        if self.max_requests is not None and self.requests_started >= self.max_requests:
+            return False
+        return True
+
+    @property
+    def done(self) -> bool:
+        return not self.accepting and self.in_flight == 0
+
+    def matches(self, route_path: Optional[str]) -> bool:
+        return self.route is None or self.route == route_path
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack text: 'frame;frame;frame count' per line"""
+        lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        for kind, seconds in self.external_seconds.most_common():
+            weight = max(int(round(seconds / self.interval)), 1)
+            lines.append(f"[external];{kind} {weight}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "route": self.route,
+            "focus": self.focus,
+            "max_requests": self.max_requests,
+            "interval_ms": int(self.interval * 1000),
+            "started_at": self.started_at,
+            "requests_profiled": self.requests_started,
+            "in_flight": self.in_flight,
+            "done": self.done,
+            "samples": sum(self.samples.values()),
+            "external": {
+                kind: {"seconds": round(seconds, 3), "calls": self.external_calls[kind]}
+                for kind, seconds in self.external_seconds.items()
+            },
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self._sessions: Dict[int, ProfileSession] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    # ---------- Sessions ----------
+
+    def start(self, route: Optional[str] = None, focus: Optional[str] = None, max_requests: Optional[int] = None, seconds: Optional[float] = None, interval_ms: int = 5) -> ProfileSession:
+        if not max_requests and not seconds:
+            raise ValueError("Either max_requests or seconds is required")
+        with self._lock:
+            session = ProfileSession(next(self._ids), route, focus, max_requests, seconds, interval_ms)
+            self._sessions[session.id] = session
+            # Keep only the most recent sessions around
+            for old_id in sorted(self._sessions)[:-MAX_SESSIONS_KEPT]:
+                if self._sessions[old_id].done:
+                    del self._sessions[old_id]
+            # The sampler clears self._sampler under this lock when it exits, so it cannot
+            # miss a session started while it is shutting down
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, daemon=True, name="profiler-sampler")
+                self._sampler.start()
+        return session
+
+    def stop(self, session_id: int) -> Optional[ProfileSession]:
+        session = self.get(session_id)
+        if session:
+            session.stopped = True
+        return session
+
+    def get(self, session_id: int) -> Optional[ProfileSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def list(self) -> List[ProfileSession]:
+        return self._snapshot()
+
+    def _snapshot(self) -> List[ProfileSession]:
+        # start() mutates _sessions from another thread; never iterate it unlocked
+        with self._lock:
+            return list(self._sessions.values())
+
+    def _any_active(self, sessions) -> bool:
+        return any(not s.done for s in sessions)
+
+    @property
+    def active(self) -> bool:
+        return self._any_active(self._snapshot())
+
+    def _recording(self) -> List[ProfileSession]:
+        return [s for s in self._snapshot() if s.in_flight > 0]
+
+    # ---------- Request tracking ----------
+
+    def request_started(self, route_path: Optional[str]) -> List[ProfileSession]:
+        with self._lock:
+            sessions = [s for s in self._sessions.values() if s.accepting and s.matches(route_path)]
+            for session in sessions:
+                session.requests_started += 1
+                session.in_flight += 1
+        return sessions
+
+    def request_finished(self, sessions: List[ProfileSession]) -> None:
+        with self._lock:
+            for session in sessions:
+                session.in_flight -= 1
+                session.requests_finished += 1
+
+    def record_external(self, kind: str, seconds: float) -> None:
+        for session in self._recording():
+            session.external_seconds[kind] += seconds
+            session.external_calls[kind] += 1
+
+    # ---------- Sampling ----------
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._any_active(self._sessions.values()):
+                    self._sampler = None
+                    return
+            recording = self._recording()
+            if not recording:
+                time.sleep(0.01)
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = [
+                _collapse(frame, names.get(thread_id, str(thread_id)))
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != me
+            ]
+            for session in recording:
+                for stack in stacks:
+                    if stack is None:
+                        continue
+                    if session.focus:
+                        stack = _focus(stack, session.focus)
+                        if stack is None:
+                            continue
+                    session.samples[stack] += 1
+            time.sleep(min(s.interval for s in recording))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _collapse(frame, thread_name: str) -> Optional[str]:
+    """Root-first ';'-joined stack, or None for idle threads"""
+    if os.path.basename(frame.f_code.co_filename) in IDLE_LEAF_FILES:
+        return None
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+def _focus(stack: str, function_name: str) -> Optional[str]:
+    """Trims the stack to start at the outermost frame of function_name, or None if absent"""
+    frames = stack.split(";")
+    for i, label in enumerate(frames):
+        if label.split(" (", 1)[0] == function_name:
+            return ";".join(frames[i:])
+    return None
+
+
+# Single process-wide profiler
+profiler = Profiler()
+
+
+@contextmanager
+def track_external(kind: str):
+    """Times a block spent outside Python (subprocess, network) into the recording sessions"""
+    if not profiler.active:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_external(kind, time.perf_counter() - started)
+
+
+def instrument_boto3_client(client) -> None:
+    """Registers event hooks that time every API call the client makes"""
+    local = threading.local()
+
+    def before_call(model=None, **kwargs):
+        if profiler.active:
+            local.started = time.perf_counter()
+
+    def after_call(model=None, **kwargs):
+        started = getattr(local, "started", None)
+        if started is not None:
+            local.started = None
+            profiler.record_external(f"boto3:{model.name if model else 'call'}", time.perf_counter() - started)
+
+    client.meta.events.register("before-call", before_call)
+    client.meta.events.register("after-call", after_call)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware marking requests that match an active session as in flight.
+    Costs one attribute check per request when nothing is being profiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.active:
+            await self.app(scope, receive, send)
+            return
+
+        sessions = profiler.request_started(_route_path(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.request_finished(sessions)
+
+
+def _route_path(scope) -> Optional[str]:
+    """Path template of the route that will handle this request, e.g. /v1/videos/{video_id}"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
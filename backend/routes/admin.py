@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from backend.auth import get_admin_user
+from backend.profiling import profiler
+from backend.schemas import ProfileSessionCreate
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Admin"], dependencies=[Depends(get_admin_user)])
+
+
+# ---------- Profiling ----------
+
+@router.post("/admin/profiling/sessions", status_code=201)
+def start_profiling(body: ProfileSessionCreate, admin_id: str = Depends(get_admin_user)):
+    if not body.requests and not body.seconds:
+        raise HTTPException(status_code=400, detail="Set requests and/or seconds")
+    session = profiler.start(
+        route=body.route,
+        focus=body.focus,
+        max_requests=body.requests,
+        seconds=body.seconds,
+        interval_ms=body.interval_ms,
+    )
+    logger.info(f"Admin {admin_id} started profiling session {session.id} (route={body.route}, focus={body.focus})")
+    return session.summary()
+
+@router.get("/admin/profiling/sessions")
+def list_profiling_sessions():
+    return [session.summary() for session in profiler.list()]
+
+@router.get("/admin/profiling/sessions/{session_id}")
+def get_profiling_session(session_id: int):
+    session = profiler.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Profiling session not found")
+    return session.summary()
+
+@router.get("/admin/profiling/sessions/{session_id}/collapsed", response_class=PlainTextResponse)
+def get_profiling_collapsed(session_id: int):
+    # Feed to flamegraph.pl or drop into speedscope
+    session = profiler.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Profiling session not found")
+    return session.collapsed()
+
+@router.delete("/admin/profiling/sessions/{session_id}")
+def stop_profiling_session(session_id: int):
+    session = profiler.stop(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Profiling session not found")
+    return session.summary()
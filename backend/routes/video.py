@@ -1,33 +1,143 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, BackgroundTasks, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from backend.config import settings
-from backend.schemas import VideoRead, VideoReadWithUrl, VideoGenerationResponse, IgUploadResponse, IgUploadRequest
-from backend.db.models import Video, VideoStatus, get_db
+from backend.schemas import VideoRead, VideoReadWithUrl, VideoGenerationResponse, IgUploadResponse, IgUploadRequest, GenerationJobRead
+from backend.db.models import Video, VideoStatus, SessionLocal, get_db
 from backend.services.instagram_service import upload_reel
-from backend.services.veo_service import generate_video as veo_generate_video
-from backend.services.video_generator import concatenate_videos
+from backend.services.veo_service import MAX_VIDEO_VARIANTS
 from backend.services.aws_service import upload_video as s3_upload_video, get_video_url as s3_get_video_url
-from backend.services import video_service
-from backend.auth import get_current_user, get_current_user_optional
+from backend.services import video_service, generation_service, job_service, export_service
+from backend.services.video_cache import video_cache
+from backend.services.admission_service import AdmissionRejected, admission_controller, segments_for
+from backend.services import video_store
+from backend.auth import get_admin_user, get_current_user, get_current_user_optional
 from pydantic import BaseModel
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import time
 import uuid
 import logging
 import os
 import json
+import orjson
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Videos"])
 
+# Presigned URLs in read responses live this long
+PLAYBACK_URL_EXPIRES_IN = 3600
+# Validators roll over every half URL lifetime so a 304 never keeps a client on an expired URL
+VALIDATOR_WINDOW_SECONDS = PLAYBACK_URL_EXPIRES_IN // 2
+READ_CACHE_CONTROL = "private, max-age=0, must-revalidate"
+
+
+# ---------- Conditional request helpers ----------
+
+def _validator_window_start() -> datetime:
+    now = int(time.time())
+    return datetime.utcfromtimestamp(now - now % VALIDATOR_WINDOW_SECONDS)
+
+def _build_validators(*parts, updated_at: Optional[datetime]) -> dict:
+    """
+    Builds ETag / Last-Modified / Cache-Control headers from the given version parts.
+    updated_at is naive UTC (as stored on Video); the current URL window is mixed into both validators.
+    """
+    window_start = _validator_window_start()
+    digest = hashlib.sha1(
+        "|".join(str(p) for p in (*parts, window_start.isoformat())).encode()
+    ).hexdigest()[:20]
+    last_modified = max(updated_at, window_start) if updated_at else window_start
+    return {
+        "ETag": f'W/"{digest}"',
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True),
+        "Cache-Control": READ_CACHE_CONTROL,
+    }
+
+def _is_not_modified(request: Request, headers: dict) -> bool:
+    """
+    Evaluates If-None-Match (preferred) or If-Modified-Since against the built validators
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = headers["ETag"].removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == current for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return parsedate_to_datetime(headers["Last-Modified"]) <= since
+    return False
+
+def _not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
     
 # ---------- Generate Video ----------
+ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+
+def _parse_generation_form(duration: str, variants: str) -> tuple[int, int]:
+    """
+    Validates the duration / variants form fields shared by the sync and queued generate routes
+    """
+    # Convert duration and variant count to int
+    try:
+        duration_int = int(duration)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid duration format")
+    try:
+        num_variants = int(variants)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid variants format")
+
+    # Validate duration
+    if duration_int not in [8, 16, 24]:
+        raise HTTPException(
+            status_code=400,
+            detail="Duration must be 8, 16, or 24 seconds"
+        )
+    if not 1 <= num_variants <= MAX_VIDEO_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Variants must be between 1 and {MAX_VIDEO_VARIANTS}"
+        )
+    return duration_int, num_variants
+
+async def _read_reference_image(image: Optional[UploadFile]) -> tuple[Optional[bytes], Optional[str]]:
+    """
+    Validates the optional reference image and returns (bytes, extension)
+    """
+    if not image:
+        return None, None
+
+    # Validate image file type
+    file_ext = os.path.splitext(image.filename)[1].lower()
+    if file_ext not in ALLOWED_IMAGE_EXTENSIONS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid image format. Allowed: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}"
+        )
+    return await image.read(), file_ext
+
+def _too_many_requests(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
 @router.post("/videos/generate", response_model=VideoGenerationResponse)
 async def generate_video_endpoint(
     prompt: str = Form(...),  # Single base prompt string with numbered sections
     duration: str = Form("8"),  # Duration as string from form, will convert to int
     title: Optional[str] = Form(None),  # Product name/title
+    variants: str = Form("1"),  # Number of candidate videos to produce from one Veo operation
     image: Optional[UploadFile] = File(None),
     user_id: str = Depends(get_current_user),  # Require authentication
     db: Session = Depends(get_db),
@@ -36,160 +146,56 @@ async def generate_video_endpoint(
     logger.info(f"Title: {title}")
     logger.info(f"Duration (raw): {duration} (type: {type(duration)})")
     
-    # Convert duration to int
-    try:
-        duration_int = int(duration)
-    except (ValueError, TypeError):
-        raise HTTPException(status_code=400, detail="Invalid duration format")
+    duration_int, num_variants = _parse_generation_form(duration, variants)
     
     logger.info(f"Duration (converted): {duration_int} seconds")
     logger.info(f"Base prompt (first 150 chars): {prompt[:150]}...")
     if image:
         logger.info(f"Reference image provided: {image.filename}")
     
-    # Validate duration
-    if duration_int not in [8, 16, 24]:
-        raise HTTPException(
-            status_code=400,
-            detail="Duration must be 8, 16, or 24 seconds"
-        )
-    
-    # Calculate how many videos to generate (each video is 8 seconds)
-    num_videos = duration_int // 8
-    logger.info(f"Will generate {num_videos} video(s) of 8 seconds each")
-    
     image_path = None
-    generated_video_paths: List[str] = []
+
+    # Reject up front when the API fleet already runs as many generations as it can take
+    try:
+        admission_ticket = await run_in_threadpool(admission_controller.acquire, segments_for(duration_int), num_variants)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected generation request from user {user_id}: {e}")
+        raise _too_many_requests(e)
     
     try:
         # Generate unique video ID
         video_id = str(uuid.uuid4())
         
         # Save uploaded image temporarily if provided
-        if image:
-            # Validate image file type
-            allowed_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
-            file_ext = os.path.splitext(image.filename)[1].lower()
-            
-            if file_ext not in allowed_extensions:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Invalid image format. Allowed: {', '.join(allowed_extensions)}"
-                )
-            
-            image_path = f"{video_id}_reference{file_ext}"
+        image_bytes, image_ext = await _read_reference_image(image)
+        if image_bytes is not None:
+            image_path = f"{video_id}_reference{image_ext}"
             logger.info(f"Saving reference image to: {image_path}")
-            
-            # Save the uploaded image
             with open(image_path, "wb") as f:
-                content = await image.read()
-                f.write(content)
-            
+                f.write(image_bytes)
             logger.info(f"Reference image saved successfully")
         
-        # Generate multiple videos using segment-specific prompts
-        for i in range(num_videos):
-            segment_num = i + 1
-            logger.info(f"Generating video segment {segment_num}/{num_videos} for video_id: {video_id}")
-            
-            # Create a unique filename for each segment
-            segment_filename = f"{video_id}_segment_{i}.mp4"
-            
-            # Add "Focus ONLY on part X" instruction to the base prompt
-            segment_prompt = f"Focus ONLY on part {segment_num} of this ad concept. {prompt}"
-            logger.info(f"Segment {segment_num} prompt (first 150 chars): {segment_prompt[:150]}...")
-            
-            # Call the veo service to generate video with the segment-specific prompt
-            generated_file_path = veo_generate_video(segment_prompt, segment_filename, image_path)
-            
-            if not os.path.exists(generated_file_path):
-                raise HTTPException(status_code=500, detail=f"Video segment {segment_num} generation failed - file not found")
-            
-            generated_video_paths.append(generated_file_path)
-            logger.info(f"Video segment {segment_num} generated successfully: {generated_file_path}")
-        
-        # Determine final output path
-        if num_videos == 1:
-            # Single video, no concatenation needed
-            final_video_path = generated_video_paths[0]
-            output_filename = f"{video_id}.mp4"
-            # Rename the file to match expected output name
-            final_output_path = output_filename
-            os.rename(final_video_path, final_output_path)
-            final_video_path = final_output_path
-        else:
-            # Multiple videos, concatenate them
-            logger.info(f"Concatenating {num_videos} video segments...")
-            logger.info(f"Segment files: {generated_video_paths}")
-            output_filename = f"{video_id}.mp4"
-            final_video_path = concatenate_videos(generated_video_paths, output_filename)
-            logger.info(f"Videos concatenated successfully: {final_video_path}")
-            
-            # Verify the concatenated file
-            if os.path.exists(final_video_path):
-                file_size = os.path.getsize(final_video_path)
-                logger.info(f"Concatenated video size: {file_size} bytes")
-            else:
-                raise HTTPException(status_code=500, detail="Concatenated video file not found")
-        
-        # Upload to S3 and save to database using video_service
-        video_record = None
-        try:
-            with open(final_video_path, "rb") as video_file:
-                # Convert to UploadFile-like object
-                from io import BytesIO
-                
-                file_content = video_file.read()
-                upload_file = UploadFile(
-                    filename=output_filename,
-                    file=BytesIO(file_content)
-                )
-                
-                # Use video_service to handle upload and DB record creation
-                # Pass content_type explicitly since UploadFile from BytesIO doesn't have one
-                video_record = video_service.upload_video(
-                    db=db,
-                    owner_id=user_id,
-                    upload_file=upload_file,
-                    title=title or f"Generated Video - {video_id[:8]}",  # Use provided title or fallback
-                    content_type="video/mp4"
-                )
-                
-                # Get presigned URL for the uploaded video
-                video_url = video_service.presign_video(video_record, expires_in=3600)
-                upload_success = True
-                logger.info(f"Video uploaded to S3 and saved to database with ID: {video_record.id}")
-        except Exception as e:
-            logger.error(f"Failed to upload to S3: {str(e)}")
-            upload_success = False
-            video_url = None
-            logger.warning("Failed to upload to S3, but video was generated locally")
-        
-        # Clean up local files
-        try:
-            # Remove final video
-            if os.path.exists(final_video_path):
-                os.remove(final_video_path)
-                logger.info(f"Cleaned up final video file: {final_video_path}")
-            
-            # Remove segment videos if they still exist
-            for segment_path in generated_video_paths:
-                if os.path.exists(segment_path):
-                    os.remove(segment_path)
-                    logger.info(f"Cleaned up segment video: {segment_path}")
-            
-            # Remove reference image
-            if image_path and os.path.exists(image_path):
-                os.remove(image_path)
-                logger.info(f"Cleaned up reference image: {image_path}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up local files: {e}")
+        # Blocking pipeline runs on the threadpool so the event loop keeps serving reads
+        result = await run_in_threadpool(
+            generation_service.run_generation,
+            db=db,
+            owner_id=user_id,
+            prompt=prompt,
+            duration=duration_int,
+            title=title,
+            num_variants=num_variants,
+            image_path=image_path,
+            video_id=video_id,
+        )
         
+        video_urls = result["video_urls"]
         return VideoGenerationResponse(
-            message=f"Video generated successfully ({duration_int} seconds)",
-            video_id=str(video_record.id) if (upload_success and video_record) else video_id,  # Use DB ID if uploaded
+            message=f"Video generated successfully ({duration_int} seconds, {result['num_variants']} variant(s))",
+            video_id=result["video_ids"][0],
             status="completed",
-            video_url=video_url
+            video_url=video_urls[0] if video_urls else None,
+            video_ids=result["video_ids"],
+            video_urls=video_urls,
         )
         
     except HTTPException:
@@ -197,18 +203,74 @@ async def generate_video_endpoint(
         raise
     except Exception as e:
         logger.error(f"Error generating video: {str(e)}")
-        
-        # Clean up on error
+        raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
+    finally:
+        await run_in_threadpool(admission_controller.release, admission_ticket)
+
+        # Remove reference image
         try:
             if image_path and os.path.exists(image_path):
                 os.remove(image_path)
-            for segment_path in generated_video_paths:
-                if os.path.exists(segment_path):
-                    os.remove(segment_path)
-        except:
-            pass
-            
-        raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
+                logger.info(f"Cleaned up reference image: {image_path}")
+        except Exception as e:
+            logger.warning(f"Failed to clean up reference image: {e}")
+
+
+# ---------- Queued generation (run by backend.worker) ----------
+
+@router.post("/videos/generate/jobs", response_model=GenerationJobRead, status_code=202)
+async def enqueue_generation_job(
+    prompt: str = Form(...),
+    duration: str = Form("8"),
+    title: Optional[str] = Form(None),
+    variants: str = Form("1"),
+    image: Optional[UploadFile] = File(None),
+    user_id: str = Depends(get_current_user),  # Require authentication
+    db: Session = Depends(get_db),
+):
+    duration_int, num_variants = _parse_generation_form(duration, variants)
+
+    # Queue depth across all workers decides admission and the time-to-start estimate
+    try:
+        eta = await run_in_threadpool(admission_controller.check_queue, db, duration_int, num_variants)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected generation job from user {user_id}: {e}")
+        raise _too_many_requests(e)
+
+    image_bytes, image_ext = await _read_reference_image(image)
+
+    job = await run_in_threadpool(
+        job_service.enqueue_job,
+        db,
+        owner_id=user_id,
+        prompt=prompt,
+        duration=duration_int,
+        title=title,
+        variants=num_variants,
+        image_bytes=image_bytes,
+        image_ext=image_ext,
+    )
+    logger.info(f"Queued generation job {job.id} for user {user_id}, estimated start in {eta:.0f}s")
+    return GenerationJobRead.model_validate(job).model_copy(update={"estimated_start_seconds": round(eta, 1)})
+
+@router.get("/videos/jobs/stats")
+def generation_job_stats(
+    db: Session = Depends(get_db),
+    admin_id: str = Depends(get_admin_user),  # Operational data, admins only
+):
+    # Queue depth for worker autoscaling, plus this process's admission state
+    return {**job_service.queue_stats(db), "admission": admission_controller.get_stats()}
+
+@router.get("/videos/jobs/{job_id}", response_model=GenerationJobRead)
+def get_generation_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),  # Require authentication
+):
+    job = job_service.get_job(db, job_id)
+    if not job or job.owner_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
         
 
@@ -249,7 +311,7 @@ def upload_video_to_instagram(
 
     # Kick off upload in background (instagrapi is blocking)
     try:
-        background.add_task(upload_reel, url, body.caption)
+        background.add_task(upload_reel, url, body.caption, video.s3_key)
     except:
         raise HTTPException(status_code=502, detail=f"Instagram error")
 
@@ -257,27 +319,88 @@ def upload_video_to_instagram(
     
 
 
+# ---------- Delete Video ----------
+
+@router.delete("/videos/{video_id}", status_code=204)
+def delete_video_endpoint(
+    video_id: int,
+    user_id: str = Depends(get_current_user),  # Require authentication
+    db: Session = Depends(get_db)
+):
+    video = video_service.get_video_by_id(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if video.owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to delete this video")
+
+    video_service.delete_video(db, video_id)
+    return Response(status_code=204)
+
+
+# ---------- Cache stats ----------
+
+@router.get("/videos/cache/stats")
+def video_cache_stats(admin_id: str = Depends(get_admin_user)):  # Operational data, admins only
+    stats = {"metadata": {"enabled": False}, "disk": {"enabled": False}}
+    if video_cache is not None:
+        stats["metadata"] = {"enabled": True, **video_cache.get_stats()}
+    if video_store.disk_cache is not None:
+        stats["disk"] = {"enabled": True, **video_store.disk_cache.get_stats()}
+    return stats
+
+
+# ---------- Stream (local disk cache, S3 fallback) ----------
+
+@router.get("/videos/{video_id}/stream")
+def stream_video(video_id: int, background: BackgroundTasks, db: Session = Depends(get_db)):
+    video = video_service.get_video_by_id(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    # Hot copy on local disk: FileResponse answers Range requests (and uses zero-copy pathsend where the server supports it)
+    path = video_store.get_cached_path(video.s3_key)
+    if path:
+        return FileResponse(path, media_type="video/mp4", headers={"Cache-Control": "private, max-age=3600"})
+
+    # Miss: send the client to S3 now and warm the local copy for the next view
+    url = video_service.presign_video(video, expires_in=PLAYBACK_URL_EXPIRES_IN)
+    if not url:
+        raise HTTPException(status_code=500, detail="Failed to generate video URL")
+    if video_store.disk_cache is not None:
+        background.add_task(video_store.fetch_to_cache, video.s3_key)
+    return RedirectResponse(url, status_code=307)
+
+
 # ---------- Get by id (with URL) ----------
 
 @router.get("/videos/{video_id}") # returns a single VideoRead object by video id with a presigned url that expires in an hour
-def get_video(video_id: str, db: Session = Depends(get_db)):
+def get_video(video_id: str, request: Request, db: Session = Depends(get_db)):
     # Try to convert to int (database ID)
     try:
         video_id_int = int(video_id)
-        video = video_service.get_video_by_id(db, video_id_int)
     except ValueError:
         # If it's not an integer, it might be a UUID (but we don't have UUID lookup implemented)
         raise HTTPException(status_code=404, detail="Video not found. Please use the database ID.")
-    
+
+    # Answer polls from the DB row version alone, before loading, presigning or serializing
+    version = video_service.get_video_version(db, video_id_int)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    headers = _build_validators("video", video_id_int, version.updated_at, updated_at=version.updated_at)
+    if _is_not_modified(request, headers):
+        return _not_modified(headers)
+
+    # Body from the cache only while it matches the DB version
+    video = video_service.get_video_by_id(db, video_id_int, updated_at=version.updated_at)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    url = video_service.presign_video(video, expires_in=3600)
+    url = video_service.presign_video(video, expires_in=PLAYBACK_URL_EXPIRES_IN)
     if not url:
         raise HTTPException(status_code=500, detail="Failed to generate video URL")
 
-    # pydantic converts given list of hashmaps to schema
-    return VideoReadWithUrl.model_validate(
+    # Encoded straight to bytes; the fields match VideoReadWithUrl
+    return ORJSONResponse(
         {
             "id": video.id,
             "owner_id": str(video.owner_id),  # Convert UUID to string
@@ -289,15 +412,35 @@ def get_video(video_id: str, db: Session = Depends(get_db)):
             "updated_at": video.updated_at,
             "playback_url": url,
         },
-        from_attributes=False,
+        headers=headers,
     )
 
 
 # ---------- List for user (with URLs) ----------
 
-@router.get("/users/{user_id}/videos-with-urls")
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def _stream_ndjson(user_id: str, version: tuple):
+    """
+    Yields one JSON line per video as the DB cursor produces rows.
+    Uses its own session since it outlives the request handler.
+    """
+    db = SessionLocal()
+    try:
+        for record in video_service.iter_videos_with_urls_for_user(db, user_id, expires_in=PLAYBACK_URL_EXPIRES_IN, version=version):
+            yield orjson.dumps(record) + b"\n"
+    except RuntimeError as e:
+        # Headers are already sent; report the failure in-band
+        logger.error(f"Video listing stream for {user_id} failed: {e}")
+        yield orjson.dumps({"error": str(e)}) + b"\n"
+    finally:
+        db.close()
+
+@router.get("/users/{user_id}/videos-with-urls", response_model=List[VideoReadWithUrl])
 def list_user_videos(
     user_id: str, 
+    request: Request,
+    format: Optional[str] = None,  # "ndjson" to stream one video per line
     db: Session = Depends(get_db),
     current_user_id: str = Depends(get_current_user)  # Require authentication
 ):
@@ -305,9 +448,62 @@ def list_user_videos(
     if current_user_id != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
+    # Any insert/update moves max(updated_at); deletes move the count
+    latest, count = video_service.get_listing_version(db, user_id)
+    stream = format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    headers = _build_validators("listing", user_id, latest, count, "ndjson" if stream else "json", updated_at=latest)
+    headers["Vary"] = "Authorization, Accept"
+    if _is_not_modified(request, headers):
+        return _not_modified(headers)
+
+    if stream:
+        return StreamingResponse(_stream_ndjson(user_id, (latest, count)), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
     try:
-        records = video_service.list_videos_with_urls_for_user(db, user_id, expires_in=3600)
-        # Convert dicts to schema 
-        return [VideoReadWithUrl.model_validate(r, from_attributes=False) for r in records]
+        # Rows go from the cursor straight into one orjson encode (no per-row pydantic model)
+        records = video_service.list_videos_with_urls_for_user(db, user_id, expires_in=PLAYBACK_URL_EXPIRES_IN, version=(latest, count))
+        return ORJSONResponse(records, headers=headers)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ---------- Export (zip) ----------
+
+def _parse_video_ids(ids: Optional[str]) -> Optional[List[int]]:
+    """Comma-separated ids, de-duplicated in order; None (all videos) only when ids is absent"""
+    if ids is None:
+        return None
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated video ids")
+    if not parsed:
+        # An empty selection must not silently widen to every video
+        raise HTTPException(status_code=400, detail="ids must contain at least one video id")
+    return list(dict.fromkeys(parsed))
+
+@router.get("/users/{user_id}/videos/export.zip")
+def export_user_videos(
+    user_id: str,
+    ids: Optional[str] = None,  # comma-separated video ids; all of the user's videos if omitted
+    db: Session = Depends(get_db),
+    current_user_id: str = Depends(get_current_user)  # Require authentication
+):
+    # Ensure user can only access their own videos
+    if current_user_id != user_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    video_ids = _parse_video_ids(ids)
+    videos = video_service.list_videos_for_export(db, user_id, video_ids)
+    if video_ids and len(videos) != len(video_ids):
+        raise HTTPException(status_code=404, detail="Video not found")
+    if len(videos) > settings.EXPORT_MAX_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.EXPORT_MAX_VIDEOS} videos can be exported at once")
+
+    # Stored zip streamed as objects arrive; the total size is not known up front
+    filename = f"videos-{datetime.utcnow():%Y%m%d-%H%M%S}.zip"
+    return StreamingResponse(
+        export_service.iter_zip(videos),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
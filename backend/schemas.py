@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
-from backend.db.models import VideoStatus
+from backend.db.models import VideoStatus, JobStatus
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -32,10 +32,34 @@ class VideoGenerationResponse(BaseModel):
     video_id: str
     status: str
     video_url: Optional[str] = None
+    # All sibling variants from one generation; video_id/video_url mirror the first
+    video_ids: List[str] = []
+    video_urls: List[Optional[str]] = []
+
+class GenerationJobRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    status: JobStatus
+    duration: int
+    title: Optional[str] = None
+    variants: int
+    attempts: int
+    result_video_ids: Optional[List[str]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    estimated_start_seconds: Optional[float] = None  # set when the job is queued
 
 class IgUploadRequest(BaseModel):
     caption: str = ""
 
 class IgUploadResponse(BaseModel):
     status: str
-    detail: str | None = None
\ No newline at end of file
+    detail: str | None = None
+
+class ProfileSessionCreate(BaseModel):
+    route: Optional[str] = None  # path template, e.g. "/v1/videos/generate"; all routes if omitted
+    focus: Optional[str] = None  # keep only stacks through this function, e.g. "verify_token"
+    requests: Optional[int] = Field(None, ge=1)  # profile the next N matching requests
+    seconds: Optional[float] = Field(None, gt=0, le=3600)  # or everything matching for T seconds
+    interval_ms: int = Field(5, ge=1, le=1000)
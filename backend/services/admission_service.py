@@ -0,0 +1,216 @@
+"""
+Admission control in front of video generation.
+
+A generation holds a threadpool thread, local disk and Veo quota for minutes, so a spike of
+/videos/generate requests can thrash the node. Two limits guard it:
+  - GENERATION_MAX_IN_FLIGHT synchronous generations run at once across all API processes
+    (keep it well below the threadpool size so sync read endpoints always get a thread);
+  - GENERATION_MAX_QUEUED jobs may wait in the generation_job queue.
+Over either limit the request gets 429 with a computed Retry-After.
+
+On Postgres an in-flight slot is one of GENERATION_MAX_IN_FLIGHT session advisory locks, held
+on a dedicated connection for the generation's duration; a crashed process drops its locks with
+its connections. Other databases (local development) only limit this process.
+
+In-flight slot release times are estimated from this process's stage latencies recorded by
+run_generation. Queue ETAs use started_at/finished_at of recently completed generation_job rows,
+which every worker records, with a median per requested duration and variant count. Until
+samples exist a segment render is assumed to take GENERATION_DEFAULT_SEGMENT_SECONDS.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from backend.config import settings
+from backend.db.models import JobStatus, engine
+from backend.services import job_service
+from backend.services.resilience import LatencyTracker
+from backend.services.veo_service import SEGMENT_SECONDS
+from typing import Dict, Optional, Tuple
+import itertools
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Stages timed by run_generation; "render" is per Veo segment, "concat" and "upload" per variant
+STAGES = ("render", "concat", "upload")
+
+# pg_try_advisory_lock keys SLOT_LOCK_BASE .. SLOT_LOCK_BASE + max_in_flight - 1
+SLOT_LOCK_BASE = 7_315_205_000
+
+
+def segments_for(duration: int) -> int:
+    return max(duration // SEGMENT_SECONDS, 1)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        # Whole seconds, as sent in the Retry-After header
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_queued: int, default_segment_seconds: float, bind: Engine = engine):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.default_segment_seconds = default_segment_seconds
+        self.bind = bind
+        self._stages = {stage: LatencyTracker() for stage in STAGES}
+        # ticket -> (started, estimated seconds, connection holding the slot lock or None)
+        self._in_flight: Dict[int, Tuple[float, float, Optional[Connection]]] = {}
+        self._tickets = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "rejected_in_flight": 0, "rejected_queue": 0}
+
+    # ---------- Latency estimates ----------
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        self._stages[stage].record(seconds)
+
+    def stage_seconds(self, stage: str) -> Optional[float]:
+        """Median of recent samples, or None until there are enough"""
+        return self._stages[stage].percentile(50)
+
+    def estimate_job_seconds(self, segments: int, variants: int = 1) -> float:
+        """
+        Expected wall time of one generation with this many Veo segments and variants.
+        One Veo operation renders every variant of a segment; concat and upload scale with variants.
+        """
+        segments = max(segments, 1)
+        variants = max(variants, 1)
+        render = self.stage_seconds("render") or self.default_segment_seconds
+        concat = (self.stage_seconds("concat") or 0) if segments > 1 else 0
+        return segments * render + variants * (concat + (self.stage_seconds("upload") or 0))
+
+    # ---------- Synchronous generations (all API processes) ----------
+
+    def acquire(self, segments: int, variants: int = 1) -> int:
+        """
+        Takes an in-flight slot and returns its ticket; raises AdmissionRejected when all are taken.
+        Blocks on the database on Postgres, so call it off the event loop.
+        """
+        estimate = self.estimate_job_seconds(segments, variants)
+        with self._lock:
+            if self.max_in_flight and len(self._in_flight) >= self.max_in_flight:
+                self.stats["rejected_in_flight"] += 1
+                raise AdmissionRejected("Generation capacity is full, try again later", self._soonest_release(estimate))
+            ticket = next(self._tickets)
+            self._in_flight[ticket] = (time.monotonic(), estimate, None)
+
+        conn = None
+        if self.max_in_flight and self.bind.dialect.name == "postgresql":
+            try:
+                conn = self._take_slot_lock()
+            except Exception:
+                self.release(ticket)
+                raise
+            if conn is None:
+                with self._lock:
+                    self._in_flight.pop(ticket, None)
+                    self.stats["rejected_in_flight"] += 1
+                    soonest = self._soonest_release(estimate)
+                raise AdmissionRejected("Generation capacity is full, try again later", soonest)
+
+        with self._lock:
+            self._in_flight[ticket] = (self._in_flight[ticket][0], estimate, conn)
+            self.stats["admitted"] += 1
+        return ticket
+
+    def release(self, ticket: int) -> None:
+        with self._lock:
+            entry = self._in_flight.pop(ticket, None)
+        if entry is not None and entry[2] is not None:
+            self._release_slot_lock(entry[2])
+
+    def _soonest_release(self, estimate: float) -> float:
+        """
+        Seconds until an in-flight slot should free up (call under the lock). Slots held by this
+        process are known; ones held by other processes are assumed evenly spread over a run.
+        """
+        now = time.monotonic()
+        local = [started + expected - now for started, expected, _ in self._in_flight.values()]
+        remote = self.max_in_flight - len(local)
+        if remote > 0:
+            local.append(estimate / remote)
+        return min(local, default=estimate)
+
+    def _take_slot_lock(self) -> Optional[Connection]:
+        """
+        Locks a free slot on a new Postgres connection, which is returned and kept until release.
+        Returns None when every slot is held.
+        """
+        conn = self.bind.connect()
+        try:
+            for slot in range(self.max_in_flight):
+                if conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": SLOT_LOCK_BASE + slot}).scalar():
+                    # Session-level lock: it outlives this transaction, so do not sit idle in one
+                    conn.commit()
+                    conn.info["generation_slot"] = SLOT_LOCK_BASE + slot
+                    return conn
+        except Exception:
+            # It may hold a slot already; never hand that back to the pool
+            conn.invalidate()
+            conn.close()
+            raise
+        conn.close()
+        return None
+
+    def _release_slot_lock(self, conn: Connection) -> None:
+        # Unlock before the connection goes back to the pool; if that fails, drop the connection
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": conn.info.pop("generation_slot")})
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to release generation slot lock: {e}")
+            conn.invalidate()
+        finally:
+            conn.close()
+
+    # ---------- Queued jobs (all workers) ----------
+
+    def check_queue(self, db: Session, duration: int, variants: int = 1) -> float:
+        """
+        Returns the estimated seconds until a job of this shape queued now starts: the backlog's
+        work (each queued job at the recent median run time for its duration and variant count)
+        divided by the jobs workers are running, taken as the worker concurrency.
+        Raises AdmissionRejected when the queue is full.
+        """
+        stats = job_service.queue_stats(db)
+        running = max(stats[JobStatus.RUNNING.value] - stats["expired_leases"], 1)
+        recent = job_service.recent_job_seconds(db)
+        backlog = job_service.queued_backlog(db)
+
+        def job_seconds(shape: Tuple[int, int]) -> float:
+            job_duration, job_variants = shape
+            return recent.get(shape) or self.estimate_job_seconds(segments_for(job_duration), job_variants)
+
+        queue_depth = sum(backlog.values())
+        ahead = sum(count * job_seconds(shape) for shape, count in backlog.items())
+        if self.max_queued and queue_depth >= self.max_queued:
+            with self._lock:
+                self.stats["rejected_queue"] += 1
+            # Room opens once the surplus ahead of the limit has started
+            per_job = ahead / queue_depth if queue_depth else job_seconds((duration, variants))
+            raise AdmissionRejected("Generation queue is full, try again later", (queue_depth - self.max_queued + 1) * per_job / running)
+        with self._lock:
+            self.stats["admitted"] += 1
+        return ahead / running
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = {**self.stats, "in_flight": len(self._in_flight)}
+        stats["max_in_flight"] = self.max_in_flight
+        stats["max_queued"] = self.max_queued
+        stats["stage_seconds"] = {stage: self.stage_seconds(stage) for stage in STAGES}
+        return stats
+
+
+# Single process-wide controller
+admission_controller = AdmissionController(
+    max_in_flight=settings.GENERATION_MAX_IN_FLIGHT,
+    max_queued=settings.GENERATION_MAX_QUEUED,
+    default_segment_seconds=settings.GENERATION_DEFAULT_SEGMENT_SECONDS,
+)
@@ -1,5 +1,6 @@
 import boto3
 from backend.config import settings
+from backend.profiling import instrument_boto3_client
 from fastapi import UploadFile
 
 # Create a single S3 client instance instead of creating new sessions
@@ -9,6 +10,7 @@ s3_client = boto3.client(
     aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
     region_name=settings.AWS_REGION,
 )
+instrument_boto3_client(s3_client)
 
 def upload_video(file: UploadFile, s3_key: str, content_type: str = None) -> bool:
     try:
@@ -43,4 +45,29 @@ def get_video_url(s3_key: str, expires_in: int) -> str | None:
         return url
     except Exception as e:
         print(f"Error generating URL: {e}")
+        return None
+
+def download_video(s3_key: str, dest_path: str) -> bool:
+    try:
+        s3_client.download_file(settings.AWS_S3_BUCKET_NAME, s3_key, dest_path)
+        return True
+    except Exception as e:
+        print(f"Error downloading file: {e}")
+        return False
+
+def delete_video(s3_key: str) -> bool:
+    try:
+        s3_client.delete_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key=s3_key)
+        return True
+    except Exception as e:
+        print(f"Error deleting file: {e}")
+        return False
+
+def open_video(s3_key: str):
+    """Returns (streaming body, content length) of an S3 object, or None on error"""
+    try:
+        obj = s3_client.get_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key=s3_key)
+        return obj["Body"], obj["ContentLength"]
+    except Exception as e:
+        print(f"Error opening file: {e}")
         return None
\ No newline at end of file
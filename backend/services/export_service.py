@@ -0,0 +1,159 @@
+"""
+Streaming zip export of a user's videos.
+
+The archive is written by zipfile onto an unseekable sink that the response generator
+drains after every chunk, so nothing is staged on disk or in memory. Entries are stored
+(MP4s do not compress) with data descriptors, and zip64 is used per entry when needed.
+
+Up to EXPORT_PREFETCH_CONCURRENCY objects are read ahead in background threads, each into
+a bounded chunk queue, so S3 latency overlaps with sending earlier entries. Memory stays at
+roughly concurrency x EXPORT_PREFETCH_BUFFER_BYTES whatever the number of videos.
+Objects already in the local disk cache are read from disk instead of S3.
+"""
+from backend.config import settings
+from backend.services.aws_service import open_video as s3_open_video
+from backend.services import video_store
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Optional
+import logging
+import os
+import queue
+import re
+import threading
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1024 * 1024
+_DONE = object()
+
+
+class _ZipSink:
+    """Write-only, unseekable file object; the generator takes whatever zipfile wrote so far"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class _Prefetch:
+    """Chunks of one video's bytes, produced by a pool thread and consumed in archive order"""
+
+    def __init__(self, video: dict, max_chunks: int, cancelled: threading.Event):
+        self.video = video
+        self.size: Optional[int] = None
+        self.opened = threading.Event()
+        self.chunks: queue.Queue = queue.Queue(maxsize=max_chunks)
+        self._cancelled = cancelled
+
+    def _put(self, item) -> bool:
+        # Give up once the export is abandoned so the thread is not stuck on a full queue
+        while not self._cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self) -> None:
+        source = None
+        try:
+            source = _open_source(self.video["s3_key"])
+            if source is None:
+                raise RuntimeError(f"Video {self.video['id']} could not be read from storage")
+            body, self.size = source
+            self.opened.set()
+            for chunk in iter(lambda: body.read(CHUNK_BYTES), b""):
+                if not self._put(chunk):
+                    return
+            self._put(_DONE)
+        except Exception as e:
+            self.opened.set()
+            self._put(e)
+        finally:
+            if source is not None:
+                source[0].close()
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        while True:
+            item = self.chunks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+def _open_source(s3_key: str):
+    """(readable, size) from the local disk cache if present, else from S3; None if unavailable"""
+    path = video_store.get_cached_path(s3_key)
+    if path:
+        try:
+            f = open(path, "rb")
+            return f, os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            pass  # evicted since the lookup
+    return s3_open_video(s3_key)
+
+
+def archive_name(video: dict, used: set) -> str:
+    """Readable, unique entry name such as '42-Summer Sale.mp4'"""
+    title = re.sub(r"[^\w\- .]+", "_", video.get("title") or "").strip(" .")[:80]
+    ext = os.path.splitext(video["s3_key"])[1] or ".mp4"
+    name = f"{video['id']}-{title}{ext}" if title else f"{video['id']}{ext}"
+    while name in used:
+        name = f"{video['id']}-{len(used)}{ext}"
+    used.add(name)
+    return name
+
+
+def iter_zip(videos: List[dict], concurrency: Optional[int] = None, buffer_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yields a stored zip of the given video rows (dicts with id, title, s3_key, created_at), in order.
+    Meant as a StreamingResponse body; closing the generator stops the prefetch threads.
+    A video that cannot be read aborts the stream, since the response headers are already sent.
+    """
+    concurrency = concurrency or settings.EXPORT_PREFETCH_CONCURRENCY
+    max_chunks = max((buffer_bytes or settings.EXPORT_PREFETCH_BUFFER_BYTES) // CHUNK_BYTES, 1)
+    cancelled = threading.Event()
+    prefetches = [_Prefetch(video, max_chunks, cancelled) for video in videos]
+    sink = _ZipSink()
+    used_names: set = set()
+
+    # Workers pick videos up in archive order, so the one being sent is always being fetched
+    pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="zip-export")
+    try:
+        for prefetch in prefetches:
+            pool.submit(prefetch.run)
+
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for prefetch in prefetches:
+                prefetch.opened.wait()
+                created_at = prefetch.video.get("created_at") or datetime.utcnow()
+                info = zipfile.ZipInfo(archive_name(prefetch.video, used_names), date_time=created_at.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                # A known size lets zipfile pick zip64 for the entry up front
+                info.file_size = prefetch.size or 0
+                with archive.open(info, mode="w", force_zip64=prefetch.size is None) as entry:
+                    for chunk in prefetch.iter_chunks():
+                        entry.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+        # Central directory
+        yield sink.drain()
+    finally:
+        cancelled.set()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,226 @@
+from sqlalchemy.orm import Session
+from backend.db.models import Video
+from backend.services.veo_service import (
+    SEGMENT_SECONDS,
+    download_variant as veo_download_variant,
+    generate_video_variants as veo_generate_video_variants,
+    render_video_variants as veo_render_video_variants,
+    variant_output_path,
+)
+from backend.services.video_generator import concatenate_videos, normalize_segment, normalized_path, postprocess_pool
+from backend.services import video_service, video_store
+from backend.services.admission_service import admission_controller
+from backend.config import settings
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCancelled(Exception):
+    """The caller gave up on the generation (e.g. the worker lost its job lease)"""
+
+
+def _check_cancelled(cancelled: Optional[threading.Event]) -> None:
+    if cancelled is not None and cancelled.is_set():
+        raise GenerationCancelled("Generation cancelled")
+
+
+def _download_segment(client, generated_video, path: str, normalize: bool) -> str:
+    """Post-processing task for one rendered segment: download it, then normalize if asked"""
+    veo_download_variant(client, generated_video, path)
+    if not normalize:
+        return path
+    return normalize_segment(path, normalized_path(path))
+
+
+def run_generation(
+    db: Session,
+    owner_id: str,
+    prompt: str,
+    duration: int,
+    title: Optional[str] = None,
+    num_variants: int = 1,
+    image_path: Optional[str] = None,
+    video_id: Optional[str] = None,
+    keep_local: bool = True,
+    cancelled: Optional[threading.Event] = None,
+    before_commit: Optional[Callable[[Session, List[Video]], None]] = None,
+) -> dict:
+    """
+    Runs the full generation pipeline: render segments in Veo, concatenate each variant,
+    upload to S3 and create the sibling video rows.
+    With more than one segment, each rendered segment is downloaded (and, with
+    SEGMENT_NORMALIZE_ENABLED, validated and normalized) in postprocess_pool while the next
+    segment renders, so only Veo rendering is on the critical path and the final concat is a
+    stream copy.
+    Shared by the /videos/generate route and the queue worker; inputs are assumed validated.
+    The reference image (if any) is owned by the caller and is not removed here.
+    keep_local moves the final files into the local disk cache; only API processes, which
+    serve /videos/{id}/stream, should set it.
+    Setting cancelled stops before the next segment or the upload with GenerationCancelled;
+    before_commit runs in the transaction inserting the video rows (see upload_video_files)
+    and may raise GenerationCancelled to drop them.
+
+    Stage latencies are recorded into admission_controller for in-flight Retry-After estimates.
+
+    Returns a dict with video_ids, video_urls (empty if the S3 upload failed) and num_variants.
+    """
+    video_id = video_id or str(uuid.uuid4())
+
+    # Calculate how many videos to generate (each video is 8 seconds)
+    num_videos = duration // SEGMENT_SECONDS
+    logger.info(f"Will generate {num_videos} segment(s) of {SEGMENT_SECONDS} seconds each, {num_variants} variant(s) per segment")
+
+    generated_video_paths: List[str] = []
+    final_video_paths: List[str] = []
+    # A single segment has no render to overlap and no concat to save; it is only renamed
+    normalize = settings.SEGMENT_NORMALIZE_ENABLED and num_videos > 1
+    postprocess_futures: List[Future] = []
+
+    try:
+        # variant_segments[j] holds the segment files (or pending normalizations) of variant j, in segment order
+        variant_segments: List[list] = []
+
+        # Generate multiple videos using segment-specific prompts
+        for i in range(num_videos):
+            _check_cancelled(cancelled)
+            segment_num = i + 1
+            logger.info(f"Generating video segment {segment_num}/{num_videos} for video_id: {video_id}")
+
+            # Create a unique filename for each segment
+            segment_filename = f"{video_id}_segment_{i}.mp4"
+
+            # Add "Focus ONLY on part X" instruction to the base prompt
+            segment_prompt = f"Focus ONLY on part {segment_num} of this ad concept. {prompt}"
+            logger.info(f"Segment {segment_num} prompt (first 150 chars): {segment_prompt[:150]}...")
+
+            # One Veo operation returns every variant of this segment
+            render_started = time.monotonic()
+            if num_videos == 1:
+                # Nothing to overlap with; download the variants right away
+                segment_items: list = veo_generate_video_variants(segment_prompt, segment_filename, image_path, number_of_videos=num_variants)
+                generated_video_paths.extend(segment_items)
+                segment_paths = segment_items
+            else:
+                client, generated_videos = veo_render_video_variants(segment_prompt, image_path, number_of_videos=num_variants)
+                segment_paths = [variant_output_path(segment_filename, j, num_variants) for j in range(len(generated_videos))]
+            admission_controller.record_stage("render", time.monotonic() - render_started)
+
+            if num_videos > 1:
+                # Hand download + normalization to post-processing and move straight on to rendering the next segment
+                segment_items = []
+                for generated_video, segment_path in zip(generated_videos, segment_paths):
+                    generated_video_paths.append(segment_path)
+                    if normalize:
+                        generated_video_paths.append(normalized_path(segment_path))
+                    future = postprocess_pool.submit(_download_segment, client, generated_video, segment_path, normalize)
+                    postprocess_futures.append(future)
+                    segment_items.append(future)
+
+            # Veo may return fewer candidates than asked; keep only variants that have every segment
+            if i == 0:
+                variant_segments = [[item] for item in segment_items]
+            else:
+                variant_segments = [items + [item] for items, item in zip(variant_segments, segment_items)]
+            logger.info(f"Video segment {segment_num} rendered: {segment_paths}")
+
+        # Wait for the post-processing still in flight (usually only the last segment's)
+        concat_started = time.monotonic()
+        if num_videos > 1:
+            variant_segments = [[future.result() for future in futures] for futures in variant_segments]
+
+        # Determine final output paths, one per variant
+        output_filenames = [
+            f"{video_id}.mp4" if len(variant_segments) == 1 else f"{video_id}_v{j}.mp4"
+            for j in range(len(variant_segments))
+        ]
+        if num_videos == 1:
+            # Single segment, no concatenation needed - rename each file to match expected output name
+            for paths, output_filename in zip(variant_segments, output_filenames):
+                os.rename(paths[0], output_filename)
+                final_video_paths.append(output_filename)
+        else:
+            # Multiple segments, concatenate each variant (in parallel, ffmpeg runs as a subprocess)
+            logger.info(f"Concatenating {num_videos} video segments for {len(variant_segments)} variant(s)...")
+            logger.info(f"Segment files: {variant_segments}")
+            with ThreadPoolExecutor(max_workers=len(variant_segments)) as pool:
+                final_video_paths = list(pool.map(
+                    lambda paths, output: concatenate_videos(paths, output, stream_copy=normalize),
+                    variant_segments,
+                    output_filenames,
+                ))
+            logger.info(f"Videos concatenated successfully: {final_video_paths}")
+            admission_controller.record_stage("concat", (time.monotonic() - concat_started) / len(final_video_paths))
+
+            # Verify the concatenated files
+            for final_video_path in final_video_paths:
+                if os.path.exists(final_video_path):
+                    file_size = os.path.getsize(final_video_path)
+                    logger.info(f"Concatenated video size: {file_size} bytes")
+                else:
+                    raise RuntimeError("Concatenated video file not found")
+
+        # Upload to S3 and save to database using video_service (sibling rows, one per variant)
+        video_records = []
+        video_urls: List[Optional[str]] = []
+        base_title = title or f"Generated Video - {video_id[:8]}"  # Use provided title or fallback
+        titles = [
+            base_title if len(final_video_paths) == 1 else f"{base_title} (Variant {j + 1})"
+            for j in range(len(final_video_paths))
+        ]
+        _check_cancelled(cancelled)
+        try:
+            upload_started = time.monotonic()
+            video_records = video_service.upload_video_files(
+                db=db,
+                owner_id=owner_id,
+                file_paths=final_video_paths,
+                titles=titles,
+                content_type="video/mp4",
+                before_commit=before_commit,
+            )
+
+            # Get presigned URLs for the uploaded videos
+            video_urls = [video_service.presign_video(record, expires_in=3600) for record in video_records]
+
+            # The owner usually watches a fresh ad right away; keep it on local disk
+            if keep_local:
+                for record, path in zip(video_records, final_video_paths):
+                    video_store.keep_local_copy(record.s3_key, path)
+            upload_success = True
+            admission_controller.record_stage("upload", (time.monotonic() - upload_started) / len(final_video_paths))
+            logger.info(f"Video(s) uploaded to S3 and saved to database with IDs: {[r.id for r in video_records]}")
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to upload to S3: {str(e)}")
+            upload_success = False
+            logger.warning("Failed to upload to S3, but video was generated locally")
+
+        # Use DB IDs if uploaded
+        return {
+            "video_ids": [str(r.id) for r in video_records] if upload_success else [video_id],
+            "video_urls": video_urls,
+            "num_variants": len(final_video_paths),
+        }
+
+    finally:
+        # Let in-flight post-processing settle so it cannot recreate files after cleanup
+        for future in postprocess_futures:
+            future.cancel()
+        wait(postprocess_futures)
+
+        # Clean up local files (final videos, then segments that still exist)
+        try:
+            for path in final_video_paths + generated_video_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+                    logger.info(f"Cleaned up local video file: {path}")
+        except Exception as e:
+            logger.warning(f"Failed to clean up local files: {e}")
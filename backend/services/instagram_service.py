@@ -1,6 +1,7 @@
 import requests, tempfile
 from pathlib import Path
 from backend.config import settings
+from backend.services.video_store import fetch_to_cache
 from instagrapi import Client
 from instagrapi.exceptions import TwoFactorRequired
 
@@ -35,11 +36,12 @@ def get_client(username: str, password: str) -> Client:
     cl.dump_settings(SESSION_FILE)
     return cl
 
-def upload_reel(url: str, caption: str):
+def upload_reel(url: str, caption: str, s3_key: str | None = None):
     USERNAME=settings.INSTAGRAM_USERNAME
     PASSWORD=settings.INSTAGRAM_PASSWORD
     cl: Client = get_client(USERNAME, PASSWORD)
-    video_path = download_to_tmp(url)
+    # Prefer the local disk cache (filled from S3 on a miss); fall back to the presigned URL
+    video_path = (fetch_to_cache(s3_key) if s3_key else None) or download_to_tmp(url)
     if not video_path.exists():
         raise RuntimeError(f"Download failed: {video_path}")
     print(f"Downloaded to: {video_path}")
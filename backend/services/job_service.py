@@ -0,0 +1,236 @@
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+from backend.config import settings
+from backend.db.models import GenerationJob, JobStatus
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import statistics
+
+# ---------- Enqueue ----------
+
+def enqueue_job(
+    db: Session,
+    owner_id: str,
+    prompt: str,
+    duration: int,
+    title: Optional[str] = None,
+    variants: int = 1,
+    image_bytes: Optional[bytes] = None,
+    image_ext: Optional[str] = None,
+) -> GenerationJob:
+    """
+    Inserts a QUEUED generation job; any worker may pick it up.
+    """
+    now = datetime.utcnow()
+    job = GenerationJob(
+        owner_id=owner_id,
+        status=JobStatus.QUEUED,
+        prompt=prompt,
+        duration=duration,
+        title=title,
+        variants=variants,
+        image_bytes=image_bytes,
+        image_ext=image_ext,
+        attempts=0,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+# ---------- Leases ----------
+
+def claim_job(db: Session, worker_id: str, lease_seconds: Optional[int] = None) -> Optional[GenerationJob]:
+    """
+    Claims the oldest runnable job (queued, or running with an expired lease) for worker_id.
+    SKIP LOCKED lets concurrent workers claim different rows without blocking on each other.
+    Returns None when the queue is empty.
+    """
+    lease_seconds = lease_seconds or settings.WORKER_LEASE_SECONDS
+
+    while True:
+        now = datetime.utcnow()
+        job = db.execute(
+            select(GenerationJob)
+            .where(
+                or_(
+                    GenerationJob.status == JobStatus.QUEUED,
+                    (GenerationJob.status == JobStatus.RUNNING) & (GenerationJob.lease_expires_at < now),
+                )
+            )
+            .order_by(GenerationJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+
+        if job is None:
+            db.rollback()
+            return None
+
+        # A job whose workers keep dying mid-lease must not be retried forever
+        if job.status == JobStatus.RUNNING and job.attempts >= settings.GENERATION_JOB_MAX_ATTEMPTS:
+            job.status = JobStatus.FAILED
+            job.error = f"Lease expired after {job.attempts} attempt(s)"
+            job.lease_owner = None
+            job.lease_expires_at = None
+            job.image_bytes = None
+            job.updated_at = now
+            db.commit()
+            continue
+
+        job.status = JobStatus.RUNNING
+        job.lease_owner = worker_id
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = now
+        job.finished_at = None
+        job.updated_at = now
+        db.commit()
+        db.refresh(job)
+        return job
+
+def heartbeat(db: Session, job_id: int, worker_id: str, lease_seconds: Optional[int] = None) -> bool:
+    """
+    Extends the lease if worker_id still owns it.
+    Returns False when the lease was lost (expired and claimed by another worker).
+    """
+    lease_seconds = lease_seconds or settings.WORKER_LEASE_SECONDS
+    now = datetime.utcnow()
+    result = db.execute(
+        update(GenerationJob)
+        .where(
+            GenerationJob.id == job_id,
+            GenerationJob.lease_owner == worker_id,
+            GenerationJob.status == JobStatus.RUNNING,
+        )
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds), updated_at=now)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def complete_job(db: Session, job_id: int, worker_id: str, video_ids: List[str]) -> bool:
+    """
+    Marks the job COMPLETED if worker_id still holds the lease. Returns False otherwise.
+    Does not commit: call it in the transaction that inserts the result's video rows, so
+    they are only kept if the lease was still held (the update locks the job row).
+    """
+    now = datetime.utcnow()
+    result = db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.lease_owner == worker_id)
+        .values(
+            status=JobStatus.COMPLETED,
+            result_video_ids=video_ids,
+            error=None,
+            lease_owner=None,
+            lease_expires_at=None,
+            image_bytes=None,  # no longer needed once rendered
+            finished_at=now,
+            updated_at=now,
+        )
+    )
+    return result.rowcount == 1
+
+def fail_job(db: Session, job_id: int, worker_id: str, error: str, max_attempts: Optional[int] = None) -> bool:
+    """
+    Releases a failed job: back to QUEUED while attempts remain, FAILED afterwards.
+    Returns False if worker_id no longer holds the lease.
+    """
+    max_attempts = max_attempts or settings.GENERATION_JOB_MAX_ATTEMPTS
+    job = db.execute(
+        select(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.lease_owner == worker_id)
+        .with_for_update()
+    ).scalar_one_or_none()
+    if job is None:
+        db.rollback()
+        return False
+
+    job.status = JobStatus.FAILED if job.attempts >= max_attempts else JobStatus.QUEUED
+    job.error = error[:2000]
+    job.lease_owner = None
+    job.lease_expires_at = None
+    job.updated_at = datetime.utcnow()
+    db.commit()
+    return True
+
+def defer_job(db: Session, job_id: int, worker_id: str, reason: str) -> bool:
+    """
+    Puts a job that could not be attempted (every Veo model's breaker was open) back to QUEUED
+    without spending one of its attempts. Returns False if worker_id no longer holds the lease.
+    """
+    now = datetime.utcnow()
+    result = db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.lease_owner == worker_id)
+        .values(
+            status=JobStatus.QUEUED,
+            attempts=GenerationJob.attempts - 1,
+            error=reason[:2000],
+            lease_owner=None,
+            lease_expires_at=None,
+            started_at=None,
+            updated_at=now,
+        )
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+# ---------- Read helpers ----------
+
+def get_job(db: Session, job_id: int) -> Optional[GenerationJob]:
+    return db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+
+def queue_stats(db: Session) -> Dict[str, int]:
+    """
+    Returns job counts per status plus expired leases; queue depth drives worker autoscaling.
+    """
+    counts = {status.value: 0 for status in JobStatus}
+    for status, count in db.query(GenerationJob.status, func.count(GenerationJob.id)).group_by(GenerationJob.status):
+        counts[status.value] = count
+    counts["expired_leases"] = (
+        db.query(func.count(GenerationJob.id))
+        .filter(GenerationJob.status == JobStatus.RUNNING, GenerationJob.lease_expires_at < datetime.utcnow())
+        .scalar()
+    )
+    counts["queue_depth"] = counts[JobStatus.QUEUED.value] + counts["expired_leases"]
+    return counts
+
+def queued_backlog(db: Session) -> Dict[Tuple[int, int], int]:
+    """
+    Returns the runnable backlog (queued jobs plus expired leases) counted per (duration, variants).
+    """
+    runnable = or_(
+        GenerationJob.status == JobStatus.QUEUED,
+        (GenerationJob.status == JobStatus.RUNNING) & (GenerationJob.lease_expires_at < datetime.utcnow()),
+    )
+    rows = (
+        db.query(GenerationJob.duration, GenerationJob.variants, func.count(GenerationJob.id))
+        .filter(runnable)
+        .group_by(GenerationJob.duration, GenerationJob.variants)
+    )
+    return {(duration, variants): count for duration, variants, count in rows}
+
+def recent_job_seconds(db: Session, limit: int = 100) -> Dict[Tuple[int, int], float]:
+    """
+    Median run time (started_at to finished_at) of the last `limit` completed jobs, per
+    (duration, variants). Recorded by every worker, so this reflects the whole fleet.
+    """
+    rows = (
+        db.query(GenerationJob.duration, GenerationJob.variants, GenerationJob.started_at, GenerationJob.finished_at)
+        .filter(
+            GenerationJob.status == JobStatus.COMPLETED,
+            GenerationJob.started_at.isnot(None),
+            GenerationJob.finished_at.isnot(None),
+        )
+        .order_by(GenerationJob.finished_at.desc())
+        .limit(limit)
+    )
+    samples: Dict[Tuple[int, int], List[float]] = {}
+    for duration, variants, started_at, finished_at in rows:
+        samples.setdefault((duration, variants), []).append((finished_at - started_at).total_seconds())
+    return {shape: statistics.median(seconds) for shape, seconds in samples.items()}
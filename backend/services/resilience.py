@@ -0,0 +1,129 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies (seconds) with percentile lookup"""
+
+    def __init__(self, window: int = 50):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 5) -> Optional[float]:
+        """Nearest-rank percentile, or None until min_samples have been recorded"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        rank = max(int(round(pct / 100 * len(samples))) - 1, 0)
+        return samples[min(rank, len(samples) - 1)]
+
+
+class CircuitBreakerOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Count-based circuit breaker over the last `window` calls.
+
+    Trips OPEN when at least `min_calls` outcomes are recorded and the share of failures
+    (errors, or calls slower than `slow_call_seconds`) reaches `failure_rate`.
+    After `cooldown_seconds` it lets a single trial call through (HALF_OPEN);
+    the trial's outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: Optional[float] = None,
+        window: int = 20,
+        min_calls: int = 5,
+        cooldown_seconds: float = 60,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """True if a call may proceed now; claims the single trial slot when half-open"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_seconds or self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self, seconds: Optional[float] = None) -> None:
+        if seconds is not None and self.slow_call_seconds and seconds > self.slow_call_seconds:
+            self._record(failed=True, reason=f"slow call ({seconds:.0f}s)")
+        else:
+            self._record(failed=False)
+
+    def record_failure(self, reason: str = "error") -> None:
+        self._record(failed=True, reason=reason)
+
+    def release(self) -> None:
+        """Ends a call without recording an outcome (it failed for reasons of its own); frees the trial slot"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def seconds_until_allowed(self) -> float:
+        """Remaining cooldown while OPEN, 0 when a call (or half-open trial) could go through now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+            return max(self._opened_at + self.cooldown_seconds - time.monotonic(), 0.0)
+
+    def _record(self, failed: bool, reason: str = "") -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if failed:
+                    self._trip(reason)
+                else:
+                    logger.info(f"Circuit breaker '{self.name}' closed after successful trial")
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append(failed)
+            if self._state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                rate = sum(self._outcomes) / len(self._outcomes)
+                if rate >= self.failure_rate:
+                    self._trip(f"{reason}, failure rate {rate:.0%}")
+
+    def _trip(self, reason: str) -> None:
+        logger.warning(f"Circuit breaker '{self.name}' opened: {reason}")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
@@ -2,13 +2,85 @@ import os
 import time
 import logging
 import mimetypes
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
 from backend.config import settings
+from backend.services.resilience import CircuitBreaker, CircuitBreakerOpen, LatencyTracker
+import httpx
 
 logger = logging.getLogger(__name__)
 
+# Veo returns at most this many candidates per operation
+MAX_VIDEO_VARIANTS = 4
+
+# Each Veo segment renders this many seconds
+SEGMENT_SECONDS = 8
+
+# Per-model health, shared by every generation in this process
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+# google.rpc codes of a failed operation that point at the model rather than the request:
+# DEADLINE_EXCEEDED, INTERNAL, UNAVAILABLE
+UNAVAILABLE_RPC_CODES = {4, 13, 14}
+
+
+class VeoDeadlineExceeded(Exception):
+    pass
+
+
+class VeoOperationFailed(Exception):
+    """A finished operation without usable videos; unavailable marks server-side failures"""
+
+    def __init__(self, reason: str, unavailable: bool = False):
+        super().__init__(reason)
+        self.unavailable = unavailable
+
+
+def get_models() -> List[str]:
+    """Ordered fallback list from VEO_MODELS (comma-separated)"""
+    return [m.strip() for m in settings.VEO_MODELS.split(",") if m.strip()]
+
+def get_breaker(model: str) -> CircuitBreaker:
+    # Created under the lock so concurrent first calls share one breaker
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(
+                name=f"veo:{model}",
+                failure_rate=settings.VEO_BREAKER_FAILURE_RATE,
+                slow_call_seconds=settings.VEO_BREAKER_SLOW_CALL_SECONDS,
+                window=settings.VEO_BREAKER_WINDOW,
+                min_calls=settings.VEO_BREAKER_MIN_CALLS,
+                cooldown_seconds=settings.VEO_BREAKER_COOLDOWN_SECONDS,
+            )
+        return _breakers[model]
+
+def get_latency_tracker(model: str) -> LatencyTracker:
+    with _registry_lock:
+        if model not in _latencies:
+            _latencies[model] = LatencyTracker()
+        return _latencies[model]
+
+def seconds_until_available() -> float:
+    """0 if some model's breaker lets calls through, else the shortest remaining cooldown"""
+    return min((get_breaker(model).seconds_until_allowed() for model in get_models()), default=0.0)
+
+def counts_against_breaker(error: Exception) -> bool:
+    """
+    Only timeouts and server-side unavailability say the model is unhealthy.
+    Request-specific failures (content filter, 400 invalid argument) do not.
+    """
+    if isinstance(error, (VeoDeadlineExceeded, genai_errors.ServerError, httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, VeoOperationFailed):
+        return error.unavailable
+    return False
+
 
 def get_mime_type(file_path: str) -> str:
     """Detect MIME type from file extension"""
@@ -27,21 +99,67 @@ def get_mime_type(file_path: str) -> str:
     }
     return mime_types.get(ext, 'image/jpeg')
 
+def variant_output_path(output_path: str, index: int, number_of_videos: int) -> str:
+    """Output path for the index-th candidate; a single candidate keeps output_path as-is"""
+    if number_of_videos == 1:
+        return output_path
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_v{index}{ext or '.mp4'}"
+
 def generate_video(prompt: str, output_path: str = "dialogue_example.mp4", image_path: Optional[str] = None, aspect_ratio: str = "9:16") -> str:
+    return generate_video_variants(prompt, output_path, image_path, aspect_ratio, number_of_videos=1)[0]
+
+def generate_video_variants(prompt: str, output_path: str = "dialogue_example.mp4", image_path: Optional[str] = None, aspect_ratio: str = "9:16", number_of_videos: int = 1) -> List[str]:
+    """
+    Generates number_of_videos candidates from a single Veo operation and downloads them concurrently.
+    Returns the saved paths, one per candidate Veo returned (see variant_output_path).
+    """
+    client, generated_videos = render_video_variants(prompt, image_path, aspect_ratio, number_of_videos)
+
+    with ThreadPoolExecutor(max_workers=len(generated_videos)) as pool:
+        output_paths = list(pool.map(
+            lambda index: download_variant(client, generated_videos[index], variant_output_path(output_path, index, number_of_videos)),
+            range(len(generated_videos)),
+        ))
+
+    logger.info(f"🎬 Generated video(s) saved to: {output_paths}")
+    return output_paths
+
+def download_variant(client: genai.Client, generated_video, path: str) -> str:
+    """Downloads one rendered candidate (from render_video_variants) to path and returns it"""
+    try:
+        client.files.download(file=generated_video.video)
+        generated_video.video.save(path)
+    except Exception as e:
+        logger.error(f"❌ Error downloading generated video: {str(e)}", exc_info=True)
+        raise Exception(f"Veo video download failed: {str(e)}")
+    if not os.path.exists(path):
+        raise Exception(f"Veo video download failed: {path} not found")
+    return path
+
+def render_video_variants(prompt: str, image_path: Optional[str] = None, aspect_ratio: str = "9:16", number_of_videos: int = 1):
+    """
+    Runs a single Veo operation for number_of_videos candidates without downloading them,
+    so callers can fetch each one off the critical path (see download_variant).
+    Returns (client, generated videos).
+    """
+    if not 1 <= number_of_videos <= MAX_VIDEO_VARIANTS:
+        raise ValueError(f"number_of_videos must be between 1 and {MAX_VIDEO_VARIANTS}")
+
     try:
         logger.info("Initializing Google GenAI client for Veo video generation.")
         client = genai.Client(api_key=settings.GOOGLE_AI_API_KEY)
 
         logger.info(f"Starting video generation with prompt: {prompt[:100]}...")
-        logger.info(f"Aspect ratio: {aspect_ratio}")
+        logger.info(f"Aspect ratio: {aspect_ratio}, variants: {number_of_videos}")
 
         # Build the generation request with config
         config = types.GenerateVideosConfig(
-            aspectRatio=aspect_ratio  # 9:16 for portrait (Instagram/TikTok), 16:9 for landscape
+            aspectRatio=aspect_ratio,  # 9:16 for portrait (Instagram/TikTok), 16:9 for landscape
+            numberOfVideos=number_of_videos
         )
         
         generation_args = {
-            "model": "veo-3.0-fast-generate-001",
             "prompt": prompt,
             "config": config
         }
@@ -69,27 +187,114 @@ def generate_video(prompt: str, output_path: str = "dialogue_example.mp4", image
         elif image_path:
             logger.warning(f"⚠️ Image path provided but not found: {image_path}")
 
-        logger.info("Sending video generation request to Veo...")
-        operation = client.models.generate_videos(**generation_args)
+        # Try each model in order, skipping ones whose breaker is open.
+        # The segment deadline covers all attempts; fallbacks get whatever budget is left.
+        deadline = time.monotonic() + settings.VEO_SEGMENT_DEADLINE_SECONDS
+        operation = None
+        errors = []
+        for model in get_models():
+            if time.monotonic() >= deadline:
+                errors.append(f"{model}: segment deadline of {settings.VEO_SEGMENT_DEADLINE_SECONDS:.0f}s exhausted")
+                break
+            breaker = get_breaker(model)
+            if not breaker.allow():
+                logger.warning(f"Skipping {model}: circuit breaker {breaker.state}")
+                errors.append(f"{model}: circuit open")
+                continue
+            try:
+                operation, latency = _run_operation(client, model, generation_args, deadline)
+                breaker.record_success(latency)
+                get_latency_tracker(model).record(latency)
+                break
+            except Exception as e:
+                if counts_against_breaker(e):
+                    breaker.record_failure(str(e))
+                else:
+                    breaker.release()
+                logger.warning(f"Veo model {model} failed: {e}")
+                errors.append(f"{model}: {e}")
 
-        # Poll the operation until it's done
-        wait_count = 0
-        while not operation.done:
-            wait_count += 1
-            logger.info(f"Waiting for Veo to finish rendering... ({wait_count * 10}s elapsed)")
-            time.sleep(10)
-            operation = client.operations.get(operation)
+        if operation is None:
+            if errors and all(err.endswith("circuit open") for err in errors):
+                raise CircuitBreakerOpen(f"All Veo models unavailable: {'; '.join(errors)}")
+            raise Exception(f"All Veo models failed: {'; '.join(errors)}")
 
-        logger.info("✅ Video generation completed. Downloading the file...")
+        logger.info("✅ Video generation completed.")
 
-        # Retrieve and save the generated video
-        generated_video = operation.response.generated_videos[0]
-        client.files.download(file=generated_video.video)
-        generated_video.video.save(output_path)
-
-        logger.info(f"🎬 Generated video saved to: {output_path}")
-        return output_path
+        generated_videos = operation.response.generated_videos
+        if len(generated_videos) < number_of_videos:
+            logger.warning(f"Requested {number_of_videos} variants, Veo returned {len(generated_videos)}")
+        return client, generated_videos
 
+    except CircuitBreakerOpen:
+        raise
     except Exception as e:
         logger.error(f"❌ Error in video generation: {str(e)}", exc_info=True)
         raise Exception(f"Veo video generation failed: {str(e)}")
+
+def _operation_failure(operation) -> Optional[VeoOperationFailed]:
+    """Why a finished operation is unusable, or None if it produced videos"""
+    if operation.error:
+        error = operation.error
+        code = error.get("code") if isinstance(error, dict) else getattr(error, "code", None)
+        return VeoOperationFailed(str(error), unavailable=code in UNAVAILABLE_RPC_CODES)
+    if not operation.response or not operation.response.generated_videos:
+        # Typically the safety filter rejected the prompt or image
+        return VeoOperationFailed("Veo returned no videos")
+    return None
+
+def _run_operation(client: genai.Client, model: str, generation_args: dict, deadline: float):
+    """
+    Submits the generation to one model and polls it until it produces videos.
+
+    If VEO_HEDGE_ENABLED and the operation is still running after the model's
+    VEO_HEDGE_PERCENTILE latency, a second identical operation is submitted and
+    whichever finishes first wins. Raises VeoDeadlineExceeded once the segment's
+    deadline (time.monotonic() value shared by every model attempt) passes, or the
+    failure of the last live operation.
+
+    Returns (operation, seconds from first submission to completion).
+    """
+    started = time.monotonic()
+    hedge_delay = None
+    if settings.VEO_HEDGE_ENABLED:
+        hedge_delay = get_latency_tracker(model).percentile(settings.VEO_HEDGE_PERCENTILE) or settings.VEO_HEDGE_DEFAULT_DELAY_SECONDS
+
+    logger.info(f"Sending video generation request to Veo ({model})...")
+    pending = [client.models.generate_videos(model=model, **generation_args)]
+    hedged = False
+    last_failure = None
+
+    # Poll the operations until one is done
+    while True:
+        still_pending = []
+        for operation in pending:
+            if not operation.done:
+                operation = client.operations.get(operation)
+            if not operation.done:
+                still_pending.append(operation)
+                continue
+            failure = _operation_failure(operation)
+            if failure is None:
+                return operation, time.monotonic() - started
+            logger.warning(f"Veo operation on {model} failed: {failure}")
+            last_failure = failure
+        pending = still_pending
+
+        elapsed = time.monotonic() - started
+        if not pending and (hedged or hedge_delay is None):
+            raise last_failure or VeoOperationFailed("Veo operation failed")
+        if time.monotonic() >= deadline:
+            raise VeoDeadlineExceeded(f"{model} ran out of the {settings.VEO_SEGMENT_DEADLINE_SECONDS:.0f}s segment deadline after {elapsed:.0f}s")
+
+        # Hedge: a second submission once the first runs past the usual latency (or already failed)
+        if hedge_delay is not None and not hedged and (elapsed >= hedge_delay or not pending):
+            logger.info(f"Hedging {model} after {elapsed:.0f}s (hedge delay {hedge_delay:.0f}s)")
+            pending.append(client.models.generate_videos(model=model, **generation_args))
+            hedged = True
+
+        logger.info(f"Waiting for Veo to finish rendering... ({elapsed:.0f}s elapsed)")
+        sleep_for = settings.VEO_POLL_INTERVAL_SECONDS
+        if hedge_delay is not None and not hedged:
+            sleep_for = min(sleep_for, max(hedge_delay - elapsed, 0))
+        time.sleep(max(min(sleep_for, deadline - time.monotonic()), 0))
@@ -0,0 +1,198 @@
+"""
+Read-through cache of Video metadata.
+
+Entries are plain dicts of the VideoRead columns, keyed by video id ("video:{id}") and by
+owner listing ("owner:{owner_id}", newest first). Write paths in video_service must call
+invalidate() for every row they create or change.
+
+The default backend is an in-process LRU. With VIDEO_CACHE_REDIS_URL set, a Redis backend
+is shared by every replica and worker so their invalidations reach each other; the local
+backend only sees this process's writes and relies on VIDEO_CACHE_TTL_SECONDS for the rest.
+"""
+from backend.config import settings
+from backend.db.models import VideoStatus
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+import logging
+import threading
+import time
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+class LocalCacheBackend:
+    """Bounded in-process LRU with per-entry TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared backend; values are stored as orjson with the configured TTL"""
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "adbrain:video-cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("VIDEO_CACHE_REDIS_URL is set but the 'redis' package is not installed")
+        self._client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            return None
+        value = orjson.loads(raw)
+        return [_decode_row(row) for row in value] if isinstance(value, list) else _decode_row(value)
+
+    def set(self, key: str, value) -> None:
+        self._client.set(self.prefix + key, orjson.dumps(value), ex=max(int(self.ttl_seconds), 1))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._client.delete(*(self.prefix + key for key in keys))
+
+    def size(self) -> int:
+        return -1  # not tracked for the shared backend
+
+
+def _decode_row(row: dict) -> dict:
+    for field in _DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = datetime.fromisoformat(row[field])
+    if row.get("status"):
+        row["status"] = VideoStatus(row["status"])
+    return row
+
+
+class VideoCache:
+    def __init__(self, backend, max_listing_rows: int = 500):
+        self.backend = backend
+        self.max_listing_rows = max_listing_rows
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+        # Bumped on every invalidation; a read that overlapped one must not repopulate the cache
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def video_key(video_id: int) -> str:
+        return f"video:{video_id}"
+
+    @staticmethod
+    def owner_key(owner_id: str) -> str:
+        return f"owner:{owner_id}"
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def lookup(self, key: str):
+        """Cached value or None. Backend errors count as misses so reads fall through to the DB."""
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Video cache get failed for {key}: {e}")
+            self._count("errors")
+            return None
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def begin_read(self) -> int:
+        return self._seq
+
+    def store(self, key: str, value, read_seq: int) -> None:
+        """Populates key unless an invalidation happened since read_seq"""
+        failed = None
+        # Check and set under the lock invalidate() bumps _seq with, so one cannot land in between
+        with self._lock:
+            if read_seq != self._seq:
+                return
+            try:
+                self.backend.set(key, value)
+            except Exception as e:
+                failed = e
+                self.stats["errors"] += 1
+        if failed is not None:
+            logger.warning(f"Video cache set failed for {key}: {failed}")
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[object]]):
+        value = self.lookup(key)
+        if value is not None:
+            return value
+        read_seq = self.begin_read()
+        value = loader()
+        if value is not None:
+            self.store(key, value, read_seq)
+        return value
+
+    def invalidate(self, video_id: Optional[int] = None, owner_id: Optional[str] = None) -> None:
+        keys = []
+        if video_id is not None:
+            keys.append(self.video_key(video_id))
+        if owner_id is not None:
+            keys.append(self.owner_key(owner_id))
+        with self._lock:
+            self._seq += 1
+            self.stats["invalidations"] += 1
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Video cache invalidation failed for {keys}: {e}")
+            self._count("errors")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["entries"] = self.backend.size()
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+def _make_cache() -> Optional[VideoCache]:
+    if not settings.VIDEO_CACHE_ENABLED:
+        return None
+    if settings.VIDEO_CACHE_REDIS_URL:
+        backend = RedisCacheBackend(settings.VIDEO_CACHE_REDIS_URL, settings.VIDEO_CACHE_TTL_SECONDS)
+    else:
+        backend = LocalCacheBackend(settings.VIDEO_CACHE_MAX_ENTRIES, settings.VIDEO_CACHE_TTL_SECONDS)
+    return VideoCache(backend, max_listing_rows=settings.VIDEO_CACHE_MAX_LISTING_ROWS)
+
+# Single process-wide cache; None when disabled
+video_cache = _make_cache()
@@ -1,12 +1,101 @@
 import os
 import ffmpeg
 import logging
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from backend.config import settings
+from backend.profiling import track_external
 
 logger = logging.getLogger(__name__)
 
+# Every normalized segment shares these parameters, so they can be concatenated with stream copy
+NORMALIZED_FPS = 24
+NORMALIZED_AUDIO_RATE = 48000
+NORMALIZED_SIZES = {
+    "9:16": (720, 1280),
+    "16:9": (1280, 720),
+}
 
-def concatenate_videos(video_paths: List[str], output_path: str = "concatenated_video.mp4") -> str:
+# Node-wide pool for segment post-processing. The CPU work happens in the ffmpeg child
+# processes, so threads are enough to run several at once without forking the API process.
+postprocess_pool = ThreadPoolExecutor(
+    max_workers=settings.SEGMENT_POSTPROCESS_WORKERS,
+    thread_name_prefix="segment-postprocess",
+)
+
+
+def normalized_path(video_path: str) -> str:
+    root, ext = os.path.splitext(video_path)
+    return f"{root}_norm{ext or '.mp4'}"
+
+def normalize_segment(input_path: str, output_path: Optional[str] = None, aspect_ratio: str = "9:16") -> str:
+    """
+    Validates a rendered segment and re-encodes it to the shared normalized format:
+    fixed resolution/fps, loudness-normalized stereo AAC (silence added if Veo returned no audio),
+    and faststart so the moov atom sits in front.
+    """
+    output_path = output_path or normalized_path(input_path)
+    width, height = NORMALIZED_SIZES.get(aspect_ratio, NORMALIZED_SIZES["9:16"])
+
+    # Validate before spending encode time
+    try:
+        with track_external("ffprobe"):
+            probe = ffmpeg.probe(input_path)
+    except ffmpeg.Error as e:
+        raise Exception(f"Invalid video segment {input_path}: {e.stderr.decode() if e.stderr else str(e)}")
+    streams = probe.get("streams", [])
+    if not any(s.get("codec_type") == "video" for s in streams):
+        raise Exception(f"Video segment has no video stream: {input_path}")
+    if float(probe.get("format", {}).get("duration", 0) or 0) <= 0:
+        raise Exception(f"Video segment is empty: {input_path}")
+    has_audio = any(s.get("codec_type") == "audio" for s in streams)
+
+    source = ffmpeg.input(input_path)
+    video = (
+        source.video
+        .filter("scale", width, height, force_original_aspect_ratio="decrease")
+        .filter("pad", width, height, "(ow-iw)/2", "(oh-ih)/2")
+        .filter("setsar", 1)
+        .filter("fps", NORMALIZED_FPS)
+    )
+    if has_audio:
+        audio = source.audio.filter("loudnorm", I=-16, TP=-1.5, LRA=11)
+    else:
+        audio = ffmpeg.input(f"anullsrc=channel_layout=stereo:sample_rate={NORMALIZED_AUDIO_RATE}", format="lavfi").audio
+
+    output_stream = ffmpeg.output(
+        video,
+        audio,
+        output_path,
+        vcodec='libx264',
+        acodec='aac',
+        video_bitrate='5M',
+        audio_bitrate='192k',
+        ar=NORMALIZED_AUDIO_RATE,
+        ac=2,
+        pix_fmt='yuv420p',
+        preset='medium',
+        shortest=None,
+        movflags='+faststart',
+    )
+    try:
+        with track_external("ffmpeg"):
+            ffmpeg.run(output_stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+    except ffmpeg.Error as e:
+        logger.error(f"❌ Error normalizing segment: {e.stderr.decode() if e.stderr else str(e)}")
+        raise
+
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        raise Exception(f"Normalized segment was not created: {output_path}")
+    logger.info(f"✅ Normalized segment {input_path} -> {output_path}")
+    return output_path
+
+
+def concatenate_videos(video_paths: List[str], output_path: str = "concatenated_video.mp4", stream_copy: bool = False) -> str:
+    """
+    Concatenates the videos in order. stream_copy skips re-encoding and must only be used
+    for inputs that share codec parameters (e.g. all produced by normalize_segment).
+    """
     if len(video_paths) < 2:
         raise ValueError("At least 2 videos are required for concatenation")
     
@@ -18,8 +107,8 @@ def concatenate_videos(video_paths: List[str], output_path: str = "concatenated_
     # Concatenate the videos
     concat_file = None
     try:
-        # Create a concat file list for ffmpeg
-        concat_file = "concat_list.txt"
+        # Create a concat file list for ffmpeg (named after the output so concurrent concats don't collide)
+        concat_file = f"{output_path}.concat_list.txt"
         with open(concat_file, 'w') as f:
             for video_path in video_paths:
                 # Use absolute paths and escape single quotes
@@ -32,20 +121,25 @@ def concatenate_videos(video_paths: List[str], output_path: str = "concatenated_
         # Note: Using c='copy' can fail if videos have different parameters
         input_stream = ffmpeg.input(concat_file, format='concat', safe=0)
         
-        # Re-encode to ensure all segments are compatible
-        output_stream = ffmpeg.output(
-            input_stream, 
-            output_path,
-            vcodec='libx264',  # Re-encode video
-            acodec='aac',      # Re-encode audio
-            video_bitrate='5M', # High quality
-            audio_bitrate='192k',
-            preset='medium'
-        )
+        if stream_copy:
+            # Inputs are already normalized; just remux them
+            output_stream = ffmpeg.output(input_stream, output_path, c='copy', movflags='+faststart')
+        else:
+            # Re-encode to ensure all segments are compatible
+            output_stream = ffmpeg.output(
+                input_stream, 
+                output_path,
+                vcodec='libx264',  # Re-encode video
+                acodec='aac',      # Re-encode audio
+                video_bitrate='5M', # High quality
+                audio_bitrate='192k',
+                preset='medium'
+            )
         
         # Run the ffmpeg command, overwrite output file if it exists
         logger.info(f"🎬 Running ffmpeg concatenation...")
-        ffmpeg.run(output_stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        with track_external("ffmpeg"):
+            ffmpeg.run(output_stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
         
         # Verify output file exists and has content
         if not os.path.exists(output_path):
@@ -1,42 +1,249 @@
 from fastapi import UploadFile
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from backend.config import settings
-from backend.db.models import Video, VideoStatus
-from backend.services.aws_service import upload_video as s3_upload_video, get_video_url as s3_get_video_url
+from backend.db.models import Video, VideoObject, VideoStatus
+from backend.services.aws_service import upload_video as s3_upload_video, get_video_url as s3_get_video_url, delete_video as s3_delete_video
+from backend.services.video_cache import VideoCache, video_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional
-import uuid
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Columns of a VideoRead, selected directly so listings skip ORM identity-map overhead
+VIDEO_READ_COLUMNS = (
+    Video.id,
+    Video.owner_id,
+    Video.bucket,
+    Video.s3_key,
+    Video.title,
+    Video.status,
+    Video.created_at,
+    Video.updated_at,
+)
+
+def make_content_s3_key(digest: str, filename: Optional[str]) -> str:
+    ext = os.path.splitext(filename or "")[1].lower() or ".mp4"
+    return f"videos/sha256/{digest}{ext}"
+
+def hash_file(fileobj: BinaryIO, chunk_size: int = 1 << 20) -> Tuple[str, int]:
+    """
+    Streams the file once through sha256 and rewinds it. Returns (hex digest, size in bytes).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+def invalidate_cached_video(video_id: Optional[int] = None, owner_id: Optional[str] = None) -> None:
+    """
+    Drops cached metadata for a video and/or its owner's listing. Call after every write.
+    """
+    if video_cache is not None:
+        video_cache.invalidate(video_id=video_id, owner_id=owner_id)
+
+
+# ---------- Content-addressed storage ----------
+
+def _store_content(db: Session, digest: str, filename: Optional[str], upload: Callable[[str], bool]) -> dict:
+    """
+    Makes sure S3 holds these bytes. Skips the PUT when a stored object already has the digest.
+    Returns the entry later passed to _add_reference.
+    """
+    existing = db.query(VideoObject).filter(VideoObject.sha256 == digest).first()
+    if existing is not None:
+        logger.info(f"Content {digest[:12]} already stored at {existing.s3_key}; skipping upload")
+        return {"digest": digest, "s3_key": existing.s3_key, "upload": upload, "uploaded": False}
+
+    s3_key = make_content_s3_key(digest, filename)
+    if not upload(s3_key):
+        raise RuntimeError("S3 upload failed")
+    return {"digest": digest, "s3_key": s3_key, "upload": upload, "uploaded": True}
+
+def _add_reference(db: Session, entry: dict, size: int) -> str:
+    """
+    Counts one more Video row against the object (row-locked), creating it if needed.
+    Returns the s3 key the new row must point at. Does not commit.
+    """
+    obj = db.execute(
+        select(VideoObject).where(VideoObject.sha256 == entry["digest"]).with_for_update()
+    ).scalar_one_or_none()
+    if obj is not None:
+        obj.ref_count += 1
+        return obj.s3_key
+
+    # The object we meant to reuse was deleted in between; put the bytes back first
+    if not entry["uploaded"]:
+        if not entry["upload"](entry["s3_key"]):
+            raise RuntimeError("S3 upload failed")
+        entry["uploaded"] = True
+    db.add(VideoObject(s3_key=entry["s3_key"], sha256=entry["digest"], size=size, ref_count=1))
+    db.flush()
+    return entry["s3_key"]
+
+def _is_content_race(e: IntegrityError) -> bool:
+    """Unique violation on video_object (its sha256 or key), i.e. a concurrent first upload of the same bytes"""
+    return "video_object" in str(e.orig)
+
+def _create_videos(
+    db: Session,
+    owner_id: str,
+    entries: List[dict],
+    sizes: List[int],
+    titles: List[Optional[str]],
+    before_commit: Optional[Callable[[Session, List[Video]], None]] = None,
+) -> List[Video]:
+    """
+    Adds references and video rows in one transaction. A concurrent first upload of the same
+    bytes surfaces as a unique violation on video_object.sha256; retrying then finds its row.
+    before_commit runs in that transaction once the rows have ids; raising from it rolls them back.
+    """
+    for attempt in range(2):
+        try:
+            now = datetime.utcnow()
+            videos = [
+                Video(
+                    owner_id=owner_id,
+                    bucket=settings.AWS_S3_BUCKET_NAME,
+                    s3_key=_add_reference(db, entry, size),
+                    title=title,
+                    status=VideoStatus.READY,
+                    created_at=now,
+                    updated_at=now,
+                )
+                for entry, size, title in zip(entries, sizes, titles)
+            ]
+            db.add_all(videos)
+            if before_commit is not None:
+                db.flush()
+                before_commit(db, videos)
+            db.commit()
+            break
+        except IntegrityError as e:
+            db.rollback()
+            if attempt or not _is_content_race(e):
+                raise
+        except Exception:
+            db.rollback()
+            raise
+
+    for video in videos:
+        db.refresh(video)
+        invalidate_cached_video(video.id, owner_id)
+    return videos
 
-def make_s3_key(filename: str) -> str:
-    return f"videos/{uuid.uuid4()}-{filename}"
 
 # ---------- Create / Upload ----------
 
 def upload_video(db: Session, owner_id: str, upload_file : UploadFile, title: Optional[str] = None, content_type: str = None) -> Video:
     """
-    uploads the file to S3, creates a video row, returns the ORM object.
+    uploads the file to S3 (unless identical bytes are already stored), creates a video row, returns the ORM object.
     owner_id should be a UUID string from Supabase authentication.
     """
-    s3_key = make_s3_key(upload_file.filename)
+    digest, size = hash_file(upload_file.file)
 
-    ok = s3_upload_video(upload_file, s3_key, content_type=content_type) 
-    if not ok:
-        raise RuntimeError("S3 upload failed")
-    
-    video = Video(
-        owner_id=owner_id,
-        bucket=settings.AWS_S3_BUCKET_NAME,
-        s3_key=s3_key,
-        title=title,
-        status=VideoStatus.READY, 
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow(),
-    )
+    def upload(s3_key: str) -> bool:
+        upload_file.file.seek(0)
+        return s3_upload_video(upload_file, s3_key, content_type=content_type)
+
+    entry = _store_content(db, digest, upload_file.filename, upload)
+    return _create_videos(db, owner_id, [entry], [size], [title])[0]
+
+def upload_video_files(
+    db: Session,
+    owner_id: str,
+    file_paths: List[str],
+    titles: List[Optional[str]],
+    content_type: str = "video/mp4",
+    before_commit: Optional[Callable[[Session, List[Video]], None]] = None,
+) -> List[Video]:
+    """
+    hashes and uploads local files to S3 concurrently (skipping content already stored),
+    then creates all video rows in a single commit (see _create_videos for before_commit).
+    Used for sibling variants of one generation; returns ORM objects in file_paths order.
+    """
+    def hash_path(path: str) -> Tuple[str, int]:
+        with open(path, "rb") as f:
+            return hash_file(f)
+
+    def upload_path(path: str) -> Callable[[str], bool]:
+        def upload(s3_key: str) -> bool:
+            with open(path, "rb") as f:
+                return s3_upload_video(UploadFile(filename=os.path.basename(path), file=f), s3_key, content_type=content_type)
+        return upload
+
+    with ThreadPoolExecutor(max_workers=max(len(file_paths), 1)) as pool:
+        hashes = list(pool.map(hash_path, file_paths))
+        existing = {
+            obj.sha256: obj.s3_key
+            for obj in db.query(VideoObject).filter(VideoObject.sha256.in_([digest for digest, _ in hashes]))
+        }
+        # Only content S3 does not already hold is uploaded, concurrently
+        futures = {
+            path: pool.submit(upload_path(path), make_content_s3_key(digest, path))
+            for path, (digest, _) in zip(file_paths, hashes)
+            if digest not in existing
+        }
+        entries = []
+        for path, (digest, _) in zip(file_paths, hashes):
+            if digest in existing:
+                entries.append({"digest": digest, "s3_key": existing[digest], "upload": upload_path(path), "uploaded": False})
+            else:
+                if not futures[path].result():
+                    raise RuntimeError("S3 upload failed")
+                entries.append({"digest": digest, "s3_key": make_content_s3_key(digest, path), "upload": upload_path(path), "uploaded": True})
 
-    db.add(video)
-    db.commit()
-    db.refresh(video)
-    return video
+    return _create_videos(db, owner_id, entries, [size for _, size in hashes], titles, before_commit)
+
+
+# ---------- Delete ----------
+
+def delete_video(db: Session, video_id: int) -> bool:
+    """
+    Deletes the video row and drops its reference to the stored object.
+    The S3 object is removed only when no other row points at it; that happens while the
+    object row is locked, so a concurrent upload of the same bytes waits and re-uploads.
+    Returns False if the video does not exist.
+    """
+    video = db.get(Video, video_id)
+    if video is None:
+        return False
+    s3_key, owner_id = video.s3_key, video.owner_id
+    db.delete(video)
+
+    obj = db.execute(
+        select(VideoObject).where(VideoObject.s3_key == s3_key).with_for_update()
+    ).scalar_one_or_none()
+    if obj is not None:
+        obj.ref_count -= 1
+        remove_object = obj.ref_count <= 0
+        if remove_object:
+            db.delete(obj)
+    else:
+        # Row from before content addressing: its key is only shared if rows were copied
+        db.flush()
+        remove_object = db.query(func.count(Video.id)).filter(Video.s3_key == s3_key).scalar() == 0
+
+    if remove_object and not s3_delete_video(s3_key):
+        logger.warning(f"Failed to delete S3 object {s3_key}; leaving it orphaned")
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        if remove_object:
+            logger.error(f"Commit failed after deleting S3 object {s3_key}; rows still referencing it point at a missing object")
+        raise
+    invalidate_cached_video(video_id, owner_id)
+    return True
 
 
 # ---------- Read helpers ----------
@@ -47,8 +254,37 @@ def presign_video(video: Video, expires_in: int = 3600) -> str:
     """
     return s3_get_video_url(video.s3_key, expires_in)
 
-def get_video_by_id(db: Session, video_id: int) -> Optional[Video]:
-    return db.query(Video).filter(Video.id == video_id).first()
+def _load_video_row(db: Session, video_id: int) -> Optional[dict]:
+    row = db.execute(select(*VIDEO_READ_COLUMNS).where(Video.id == video_id)).mappings().first()
+    return dict(row) if row else None
+
+def get_video_version(db: Session, video_id: int) -> Optional[Tuple[Optional[datetime]]]:
+    """
+    Returns the video's (updated_at,) row from the DB, or None if it does not exist.
+    Cheap primary-key lookup used to build validators; writes from workers or other replicas
+    do not reach a local cache, so validators never come from it.
+    """
+    return db.execute(select(Video.updated_at).where(Video.id == video_id)).first()
+
+def get_video_by_id(db: Session, video_id: int, updated_at: Optional[datetime] = None) -> Optional[Video]:
+    """
+    Read-through cached lookup. On a cache hit the result is a detached Video built from the
+    cached columns (fine for reading); use db.get() to modify a video.
+    With updated_at (from get_video_version), a cached row that disagrees with it is dropped.
+    """
+    if video_cache is None:
+        return db.query(Video).filter(Video.id == video_id).first()
+    key = VideoCache.video_key(video_id)
+    row = video_cache.lookup(key)
+    if row is not None and updated_at is not None and row["updated_at"] != updated_at:
+        video_cache.invalidate(video_id=video_id)
+        row = None
+    if row is None:
+        read_seq = video_cache.begin_read()
+        row = _load_video_row(db, video_id)
+        if row is not None:
+            video_cache.store(key, row, read_seq)
+    return Video(**row) if row else None
 
 def list_videos_for_user(db: Session, user_id: str) -> List[Video]:
     return (
@@ -58,26 +294,91 @@ def list_videos_for_user(db: Session, user_id: str) -> List[Video]:
         .all()
     )
 
-def list_videos_with_urls_for_user(db: Session, user_id: str, expires_in: int = 3600) -> list[dict]:
+def list_videos_for_export(db: Session, user_id: str, video_ids: Optional[List[int]] = None) -> List[dict]:
+    """
+    Returns VideoRead rows for an archive: the given ids in request order, or all of the user's
+    videos newest first. Ids the user does not own are left out.
+    """
+    query = select(*VIDEO_READ_COLUMNS).where(Video.owner_id == user_id)
+    if video_ids:
+        query = query.where(Video.id.in_(video_ids))
+    rows = [dict(row._mapping) for row in db.execute(query.order_by(Video.created_at.desc()))]
+    if video_ids:
+        position = {video_id: i for i, video_id in enumerate(video_ids)}
+        rows.sort(key=lambda row: position[row["id"]])
+    return rows
+
+def get_listing_version(db: Session, user_id: str) -> Tuple[Optional[datetime], int]:
+    """
+    Returns (max updated_at, row count) for a user's videos.
+    Cheap aggregate used to build cache validators without loading the rows.
+    Always read from the DB: writes from workers or other replicas do not reach a local cache.
+    """
+    latest, count = (
+        db.query(func.max(Video.updated_at), func.count(Video.id))
+        .filter(Video.owner_id == user_id)
+        .one()
+    )
+    return latest, count
+
+def _listing_matches(rows: List[dict], version: Tuple[Optional[datetime], int]) -> bool:
+    latest, count = version
+    return len(rows) == count and max((r["updated_at"] for r in rows), default=None) == latest
+
+def _iter_video_rows_for_user(db: Session, user_id: str, batch_size: int, version: Optional[Tuple[Optional[datetime], int]] = None) -> Iterator[dict]:
+    """
+    Yields the user's VideoRead rows, newest first, from the cached listing when present.
+    Otherwise streams them from the DB and caches listings of up to max_listing_rows.
+    With version (from get_listing_version), a cached listing that disagrees with it is
+    dropped, so the body always matches the validators built from the DB.
+    """
+    if video_cache is not None:
+        key = VideoCache.owner_key(user_id)
+        rows = video_cache.lookup(key)
+        if rows is not None:
+            if version is None or _listing_matches(rows, version):
+                yield from rows
+                return
+            video_cache.invalidate(owner_id=user_id)
+        read_seq = video_cache.begin_read()
+
+    result = db.execute(
+        select(*VIDEO_READ_COLUMNS)
+        .where(Video.owner_id == user_id)
+        .order_by(Video.created_at.desc())
+        .execution_options(yield_per=batch_size)
+    )
+    buffered: Optional[list] = [] if video_cache is not None else None
+    for row in result.mappings():
+        row = dict(row)
+        if buffered is not None:
+            # Stop buffering listings too large to cache; memory stays flat for those
+            if len(buffered) < video_cache.max_listing_rows:
+                buffered.append(row)
+            else:
+                buffered = None
+        yield row
+    if buffered is not None:
+        video_cache.store(key, buffered, read_seq)
+
+def iter_videos_with_urls_for_user(db: Session, user_id: str, expires_in: int = 3600, batch_size: int = 200, version: Optional[Tuple[Optional[datetime], int]] = None) -> Iterator[dict]:
+    """
+    Yields one dict per video (Video fields + presigned URL), newest first.
+    Uncached rows are fetched batch_size at a time (server-side cursor on Postgres), so memory
+    stays flat no matter how many videos the user has.
+    """
+    for row in _iter_video_rows_for_user(db, user_id, batch_size, version=version):
+        url = s3_get_video_url(row["s3_key"], expires_in)
+        if not url:
+            raise RuntimeError(f"Failed to generate URL for {row['s3_key']}")
+        record = dict(row)
+        record["owner_id"] = str(record["owner_id"])  # Convert UUID to string
+        record["playback_url"] = url
+        yield record
+
+def list_videos_with_urls_for_user(db: Session, user_id: str, expires_in: int = 3600, version: Optional[Tuple[Optional[datetime], int]] = None) -> list[dict]:
     """
     Returns a list of dicts (or schema instances in the route) combining Video fields + presigned URL.
     Kept as dicts to keep service layer decoupled from Pydantic.
     """
-    videos = list_videos_for_user(db, user_id)
-    out = []
-    for v in videos:
-        url = presign_video(v, expires_in=expires_in)
-        if not url:
-            raise RuntimeError(f"Failed to generate URL for {v.s3_key}")
-        out.append({
-            "id": v.id,
-            "owner_id": str(v.owner_id),  # Convert UUID to string
-            "bucket": v.bucket,
-            "s3_key": v.s3_key,
-            "title": v.title,
-            "status": v.status,
-            "created_at": v.created_at,
-            "updated_at": v.updated_at,
-            "playback_url": url,
-        })
-    return out
+    return list(iter_videos_with_urls_for_user(db, user_id, expires_in=expires_in, version=version))
@@ -0,0 +1,200 @@
+"""
+Local disk cache of hot MP4s in front of S3.
+
+Freshly generated videos are moved in after upload and S3 objects are pulled in on demand,
+so repeat views (/videos/{id}/stream) and Instagram publishes read from local disk.
+The cache is an LRU bounded by VIDEO_DISK_CACHE_MAX_BYTES (0 disables it), shared by all
+processes on the node through the directory.
+"""
+from backend.config import settings
+from backend.services.aws_service import download_video as s3_download_video
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DiskVideoCache:
+    """
+    LRU of MP4 files shared by every process on the node (API workers and backend.worker).
+    The directory itself is the index: reads bump a file's mtime, and puts evict the least
+    recently used files under an flock on .lock, so the whole directory stays within max_bytes.
+    """
+
+    # Temp files younger than this may belong to a fetch still running in another process
+    TEMP_MAX_AGE_SECONDS = 3600
+    # mkstemp "*.download" files plus the "*.download.<random>" boto3 writes before renaming,
+    # and put_file's ".*.tmp" staging files
+    TEMP_PATTERNS = ("*.download*", ".*.tmp")
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.directory / ".lock"
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0, "fetches": 0, "evictions": 0}
+        self._remove_stale_temp_files()
+        with self._dir_lock():
+            self._evict()
+
+    def _remove_stale_temp_files(self) -> None:
+        """Drops leftovers of crashed fetches; in-flight ones keep a fresh mtime while they are written"""
+        cutoff = time.time() - self.TEMP_MAX_AGE_SECONDS
+        for _, _, leftover in self._scan(self.TEMP_PATTERNS):
+            try:
+                if leftover.stat().st_mtime < cutoff:
+                    leftover.unlink()
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def _dir_lock(self):
+        """Cross-process lock serializing eviction scans"""
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    @staticmethod
+    def _name(s3_key: str) -> str:
+        return hashlib.sha1(s3_key.encode()).hexdigest() + ".mp4"
+
+    def get(self, s3_key: str) -> Optional[Path]:
+        """Local path if cached (and marks it recently used), else None"""
+        path = self.directory / self._name(s3_key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return path
+
+    def put_file(self, s3_key: str, src_path: str, move: bool = False) -> Optional[Path]:
+        """Adds a local file under s3_key (moved or copied in atomically). Returns the cached path."""
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return None
+        name = self._name(s3_key)
+        dest = self.directory / name
+        tmp = self.directory / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if move:
+            shutil.move(src_path, tmp)
+        else:
+            shutil.copyfile(src_path, tmp)
+        os.replace(tmp, dest)
+        with self._dir_lock():
+            self._evict(keep=name)
+        return dest
+
+    def fetch(self, s3_key: str) -> Optional[Path]:
+        """Cached path, downloading from S3 on a miss. Concurrent misses in this process download once."""
+        path = self.get(s3_key)
+        if path:
+            return path
+        with self._lock:
+            key_lock = self._fetch_locks.setdefault(s3_key, threading.Lock())
+        with key_lock:
+            path = self.get(s3_key)
+            if path:
+                return path
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".download")
+            os.close(fd)
+            try:
+                if not s3_download_video(s3_key, tmp):
+                    return None
+                self._count("fetches")
+                return self.put_file(s3_key, tmp, move=True)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                with self._lock:
+                    self._fetch_locks.pop(s3_key, None)
+
+    def _scan(self, patterns: Tuple[str, ...] = ("*.mp4",)) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every file matching patterns; cached videos by default"""
+        files = []
+        for path in (p for pattern in patterns for p in self.directory.glob(pattern)):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        # Caller holds the directory lock. Unlinking a file that is being streamed is safe on POSIX.
+        # In-flight and crashed downloads take disk too; only finished videos are evictable
+        files = self._scan()
+        total = sum(size for _, size, _ in files) + sum(size for _, size, _ in self._scan(self.TEMP_PATTERNS))
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path.name == keep:
+                continue
+            try:
+                path.unlink()
+                self._count("evictions")
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get_stats(self) -> dict:
+        files = self._scan()
+        temp_bytes = sum(size for _, size, _ in self._scan(self.TEMP_PATTERNS))
+        with self._lock:
+            stats = dict(self.stats)
+        return {**stats, "entries": len(files), "bytes": sum(size for _, size, _ in files), "temp_bytes": temp_bytes, "max_bytes": self.max_bytes}
+
+
+def _make_disk_cache() -> Optional[DiskVideoCache]:
+    if settings.VIDEO_DISK_CACHE_MAX_BYTES <= 0:
+        return None
+    directory = settings.VIDEO_DISK_CACHE_DIR or Path(tempfile.gettempdir()) / "adbrain_video_cache"
+    return DiskVideoCache(Path(directory), settings.VIDEO_DISK_CACHE_MAX_BYTES)
+
+# Single process-wide disk cache; None when disabled
+disk_cache = _make_disk_cache()
+
+
+# ---------- Helpers for callers ----------
+
+def get_cached_path(s3_key: str) -> Optional[Path]:
+    return disk_cache.get(s3_key) if disk_cache else None
+
+def fetch_to_cache(s3_key: str) -> Optional[Path]:
+    """Cached path, pulling the object from S3 on a miss; None if the cache is disabled or S3 fails"""
+    if not disk_cache:
+        return None
+    try:
+        return disk_cache.fetch(s3_key)
+    except Exception as e:
+        logger.warning(f"Failed to cache {s3_key} locally: {e}")
+        return None
+
+def keep_local_copy(s3_key: str, local_path: str) -> bool:
+    """Moves a just-uploaded local file into the cache. Returns True if it was taken."""
+    if not disk_cache:
+        return False
+    try:
+        return disk_cache.put_file(s3_key, local_path, move=True) is not None
+    except Exception as e:
+        logger.warning(f"Failed to keep local copy of {s3_key}: {e}")
+        return False
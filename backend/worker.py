@@ -0,0 +1,163 @@
+"""
+Standalone generation worker.
+
+Claims queued generation jobs from Postgres and runs the generation pipeline, independent of
+the API replicas. Run any number of these across nodes and scale them on queue depth
+(GET /v1/videos/jobs/stats):
+
+    python -m backend.worker
+"""
+from backend.config import settings
+from backend.db.models import GenerationJob, get_db_session
+from backend.db.migrations import upgrade_schema
+from backend.services import generation_service, job_service, veo_service
+from backend.services.resilience import CircuitBreakerOpen
+import logging
+import os
+import signal
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Renews the job lease every third of its length on a dedicated session.
+    Sets the lease_lost event if another worker took the job over.
+    """
+
+    def __init__(self, job_id: int, worker_id: str):
+        super().__init__(daemon=True, name=f"heartbeat-{job_id}")
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.lease_lost = threading.Event()
+
+    def run(self):
+        interval = max(settings.WORKER_LEASE_SECONDS / 3, 1)
+        db = get_db_session()
+        try:
+            while not self.stopped.wait(interval):
+                try:
+                    if not job_service.heartbeat(db, self.job_id, self.worker_id):
+                        logger.warning(f"Lost lease on job {self.job_id}")
+                        self.lease_lost.set()
+                        return
+                except Exception as e:
+                    # Transient DB error: keep trying until the lease actually expires
+                    logger.warning(f"Heartbeat for job {self.job_id} failed: {e}")
+                    db.rollback()
+        finally:
+            db.close()
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+
+class Worker:
+    def __init__(self, worker_id: str | None = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    def stop(self, *_):
+        logger.info(f"Worker {self.worker_id} stopping after current job")
+        self.stopping.set()
+
+    def run_forever(self):
+        logger.info(f"Worker {self.worker_id} started")
+        db = get_db_session()
+        try:
+            while not self.stopping.is_set():
+                # A job claimed now would only be deferred again; leave it to workers whose breakers are closed
+                unavailable = veo_service.seconds_until_available()
+                if unavailable > 0:
+                    logger.info(f"All Veo circuit breakers are open; not claiming jobs for {unavailable:.0f}s")
+                    self.stopping.wait(unavailable)
+                    continue
+
+                try:
+                    job = job_service.claim_job(db, self.worker_id)
+                except Exception as e:
+                    logger.error(f"Failed to claim job: {e}")
+                    db.rollback()
+                    job = None
+
+                if job is None:
+                    self.stopping.wait(settings.WORKER_POLL_INTERVAL_SECONDS)
+                    continue
+
+                self.run_job(db, job)
+        finally:
+            db.close()
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    def run_job(self, db, job: GenerationJob):
+        logger.info(f"Worker {self.worker_id} claimed job {job.id} (attempt {job.attempts})")
+        heartbeat = _Heartbeat(job.id, self.worker_id)
+        heartbeat.start()
+
+        # The reference image travels in the job row; materialize it for Veo
+        image_path = None
+        if job.image_bytes:
+            image_path = f"job_{job.id}_reference{job.image_ext or '.png'}"
+            with open(image_path, "wb") as f:
+                f.write(job.image_bytes)
+
+        def record_result(db, videos):
+            # Same transaction as the video rows: they are kept only if this worker still holds the lease.
+            # Stop renewing first; a renewal would wait on the row lock complete_job takes.
+            heartbeat.stop()
+            if heartbeat.lease_lost.is_set() or not job_service.complete_job(db, job.id, self.worker_id, [str(v.id) for v in videos]):
+                raise generation_service.GenerationCancelled(f"Lost lease on job {job.id}")
+
+        try:
+            result = generation_service.run_generation(
+                db=db,
+                owner_id=job.owner_id,
+                prompt=job.prompt,
+                duration=job.duration,
+                title=job.title,
+                num_variants=job.variants,
+                image_path=image_path,
+                keep_local=False,  # the API serving /stream may not share this disk
+                cancelled=heartbeat.lease_lost,
+                before_commit=record_result,
+            )
+            if not result["video_urls"]:
+                raise RuntimeError("S3 upload failed")
+            logger.info(f"Job {job.id} completed: {result['video_ids']}")
+        except generation_service.GenerationCancelled:
+            # Another worker owns the job now; no video rows were kept
+            heartbeat.stop()
+            logger.warning(f"Job {job.id} abandoned after its lease was lost; result not recorded")
+            db.rollback()
+        except CircuitBreakerOpen as e:
+            # Veo is unavailable, not the job at fault: requeue it without using up an attempt
+            heartbeat.stop()
+            logger.warning(f"Job {job.id} deferred: {e}")
+            db.rollback()
+            job_service.defer_job(db, job.id, self.worker_id, str(e))
+        except Exception as e:
+            heartbeat.stop()
+            logger.error(f"Job {job.id} failed: {e}")
+            db.rollback()
+            job_service.fail_job(db, job.id, self.worker_id, str(e))
+        finally:
+            if image_path and os.path.exists(image_path):
+                os.remove(image_path)
+
+
+def main():
+    logging.basicConfig(level=logging.DEBUG if settings.DEBUG else logging.INFO)
+    upgrade_schema()
+    worker = Worker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()